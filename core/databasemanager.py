@@ -1,4 +1,6 @@
 import os
+from pathlib import Path
+import logging
 from core.models import Table, Record, Field
 from core.file_manager import FileManager
 from indexes.bplus import BPlusTree
@@ -6,18 +8,30 @@ from indexes.isam import ISAMIndex
 from indexes.sequential_file import SequentialIndex  # NUEVO IMPORT
 from typing import List, Union, Any
 
+logger = logging.getLogger(__name__)
+
 
 class DatabaseManager:
+    __slots__ = ('table', 'filename', 'index_type', 'data_filename', 'index_filename',
+                 'file_manager', 'index', '_is_seq', '_info_cache', '_index_loaded',
+                 '_ops_since_checkpoint', '_checkpoint_every',
+                 '_add_impl', '_add_many_impl', '_get_impl', '_update_impl',
+                 '_remove_impl', '_range_impl', '_get_all_impl')
+
     def __init__(self, table: Table, filename: str, order: int = 4, index_type: str = 'bplus'):
         # index_type: 'bplus' (por defecto), 'isam', o 'sequential'
         
         self.table = table
         self.filename = filename
         self.index_type = index_type  # NUEVO: Guardar el tipo de índice
+        self._is_seq = (index_type == 'sequential')
+        self._info_cache = None  # Resultado de get_index_info hasta la próxima mutación
+        self._ops_since_checkpoint = 0
+        self._checkpoint_every = 10000  # Operaciones entre guardados completos del índice
 
         # Crear nombres de archivos para datos e índice
         self.data_filename = filename
-        self.index_filename = filename.replace('.dat', '.idx')
+        self.index_filename = str(Path(filename).with_suffix('.idx'))
 
         # ¡IMPORTANTE! El FileManager solo se usa para B+ e ISAM
         if self.index_type in ('bplus', 'isam'):
@@ -34,12 +48,18 @@ class DatabaseManager:
             # Comportamiento por defecto: B+ Tree con persistencia
             self.index = BPlusTree(order=order, index_filename=self.index_filename)
 
-        # Intentar cargar el índice desde archivo
-        if not self.index.load_from_file():
-            # Si el índice está vacío y NO es secuencial, cargamos desde FileManager
-            if self.index_type in ('bplus', 'isam'):
-                self.load_index_from_file()
-            # Si es secuencial, no necesita 'load_index_from_file', ya se maneja solo.
+        # Intentar cargar el índice desde archivo. Si no existe, la
+        # reconstrucción desde el .dat se pospone hasta la primera consulta
+        # (ver _ensure_index). Sequential no necesita construir nada.
+        self._index_loaded = self.index.load_from_file() or self._is_seq
+
+        self._bind_impls()
+
+    def _ensure_index(self):
+        """Construye el índice desde el .dat si todavía no se ha hecho."""
+        if not self._index_loaded:
+            self.load_index_from_file()
+            self._index_loaded = True
 
     def load_index_from_file(self):
         """Construye el índice B+/ISAM desde los registros existentes."""
@@ -49,164 +69,220 @@ class DatabaseManager:
             return
 
         if self.index.is_empty() and self.file_manager:
-            if os.path.exists(self.file_manager.filename):
+            if self.file_manager.file_size > 0:
                 print("Construyendo índice desde registros existentes...")
-                idx = 0
-                while True:
-                    record = self.file_manager.read_record(idx)
+                # Solo se desempaquetan clave y `next` de cada fila; el resto
+                # de campos se salta sin decodificar ni construir Records
+                pairs = []
+                append = pairs.append
+                pos = -1
+                for pos, (key, next_ptr) in enumerate(self.file_manager.iter_key_and_flag()):
+                    if next_ptr == 0:  # Solo registros válidos (no eliminados)
+                        append((key, pos))
+                self.file_manager.file_size = pos + 1
 
-                    if record is None:
-                        break
-
-                    if record.next == 0:  # Solo registros válidos (no eliminados)
-                        self.index.insert(record.key, idx)
-                    idx += 1
-                self.file_manager.file_size = idx
-                print(f"Índice construido con {len(self.index.traverse_leaves())} hojas/entradas.")
+                # Construcción de abajo hacia arriba en vez de un insert por registro
+                if self.index_type == 'isam':
+                    self.index.bulk_insert(pairs)
+                else:
+                    self.index = BPlusTree.bulk_load(pairs, order=self.index.order,
+                                                     index_filename=self.index_filename)
+                self._info_cache = None
+                print(f"Índice construido con {len(pairs)} entradas.")
 
+    # -------------------------------
+    # API PÚBLICA
+    # Cada método delega en la implementación elegida una sola vez en
+    # __init__ (ver _bind_impls) en lugar de comparar index_type por llamada.
+    # -------------------------------
     def add_record(self, record: Record):
         """Añade un nuevo registro tanto al archivo como al índice."""
-        
-        if self.index_type == 'sequential':
-            # SequentialIndex maneja su propia escritura de archivos
-            # Le pasamos el objeto Record COMPLETO
-            self.index.insert(record.key, record)
-        else:
-            # Lógica anterior para B+ e ISAM
-            pos = self.file_manager.add_record(record)
-            self.index.insert(record.key, pos)
-            
-        print(f"Registro con llave '{record.key}' añadido.")
+        self._add_impl(record)
+        self._info_cache = None
+        self._maybe_checkpoint()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Registro con llave %r añadido.", record.key)
+
+    def add_records(self, records: List[Record]):
+        """
+        Añade un lote de registros: una sola escritura al archivo de datos
+        y una inserción por lotes en el índice.
+        """
+        if not records:
+            return
+        self._add_many_impl(records)
+        self._info_cache = None
+        self._maybe_checkpoint(len(records))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("%d registros añadidos.", len(records))
 
     def get_record(self, key: Any) -> Union[Record, None]:
         """Busca un registro por su clave usando el índice."""
-        
-        if self.index_type == 'sequential':
-            # SequentialIndex.search() devuelve el Record completo
-            return self.index.search(key)
-        else:
-            # Lógica anterior
-            pos = self.index.search(key)
-            if pos is not None:
-                return self.file_manager.read_record(pos)
-        return None
+        self._ensure_index()
+        return self._get_impl(key)
 
     def update_record(self, key: Any, new_values: List[Any]) -> bool:
         """Actualiza un registro existente."""
-        
-        if self.index_type == 'sequential':
-            # Para Sequential, necesitamos eliminar y volver a insertar
-            existing_record = self.get_record(key)
-            if existing_record:
-                # Crear nuevo registro con valores actualizados
-                new_record = Record(self.table, new_values)
-                # Eliminar el viejo y agregar el nuevo
-                if self.remove_record(key):
-                    self.add_record(new_record)
-                    print(f"Registro con llave '{key}' actualizado en Sequential File.")
-                    return True
-            return False
-        else:
-            # Lógica anterior
-            pos = self.index.search(key)
-            if pos is not None:
-                new_record = Record(self.table, new_values, pos=pos)
-                self.file_manager._write_record_at_pos(new_record, pos)
-                print(f"Registro con llave '{key}' actualizado.")
-                return True
+        self._ensure_index()
+        if not self._update_impl(key, new_values):
             return False
+        self._info_cache = None
+        self._maybe_checkpoint()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Registro con llave %r actualizado.", key)
+        return True
 
     def remove_record(self, key: Any) -> bool:
         """Elimina un registro tanto del archivo como del índice."""
-        
-        if self.index_type == 'sequential':
-            # SequentialIndex.delete() hace la eliminación lógica
-            result = self.index.delete(key)
-            if result:
-                print(f"Registro con llave '{key}' eliminado del Sequential File.")
-            return result
-        else:
-            # Lógica anterior
-            pos = self.index.search(key)
-            if pos is not None:
-                if self.file_manager.remove_record(pos):
-                    self.index.delete(key)
-                    print(f"Registro con llave '{key}' eliminado.")
-                    return True
-        return False
+        self._ensure_index()
+        if not self._remove_impl(key):
+            return False
+        self._info_cache = None
+        self._maybe_checkpoint()
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Registro con llave %r eliminado.", key)
+        return True
 
     def range_search(self, start_key: Any, end_key: Any) -> List[Record]:
         """Busca todos los registros en un rango de claves."""
-        
-        if self.index_type == 'sequential':
-            # SequentialIndex.rangeSearch() devuelve la lista de Records
-            return self.index.rangeSearch(start_key, end_key)
-        else:
-            # Lógica anterior
-            found_records = []
-            positions = self.index.range_search(start_key, end_key)
-            for _, pos in positions:
-                record = self.file_manager.read_record(pos)
-                if record and record.next == 0:
-                    found_records.append(record)
-            return found_records
+        self._ensure_index()
+        return self._range_impl(start_key, end_key)
 
     def get_all(self) -> List[Record]:
         """Obtiene todos los registros válidos."""
-        
-        if self.index_type == 'sequential':
-            # Para Sequential File, leer ambos archivos
-            records = []
-            
-            # Leer archivo principal
-            try:
-                with open(self.index.data_filename, 'rb') as f:
-                    while True:
-                        data = f.read(self.index.record_size)
-                        if not data:
-                            break
-                        record = Record.unpack(self.table, data)
-                        if record.next == 0:  # Solo registros válidos
-                            records.append(record)
-            except FileNotFoundError:
-                pass
-            
-            # Leer archivo auxiliar
-            try:
-                with open(self.index.aux_filename, 'rb') as f:
-                    while True:
-                        data = f.read(self.index.record_size)
-                        if not data:
-                            break
-                        record = Record.unpack(self.table, data)
-                        if record.next == 0:  # Solo registros válidos
-                            records.append(record)
-            except FileNotFoundError:
-                pass
-            
-            return records
+        return self._get_all_impl()
+
+    def _bind_impls(self):
+        """Elige una vez las implementaciones según el tipo de índice."""
+        if self._is_seq:
+            self._add_impl = self._add_sequential
+            self._add_many_impl = self.index.add_many
+            self._get_impl = self.index.search
+            self._update_impl = self._update_sequential
+            self._remove_impl = self.index.delete
+            self._range_impl = self.index.rangeSearch
+            # Mismo orden que el executor: por llave, con el .dat antes que
+            # el .aux ante llaves iguales
+            self._get_all_impl = self.index.get_all
+        else:
+            self._add_impl = self._add_indexed
+            self._add_many_impl = self._add_many_indexed
+            self._get_impl = self._get_indexed
+            self._update_impl = self._update_indexed
+            self._remove_impl = self._remove_indexed
+            self._range_impl = self._range_indexed
+            self._get_all_impl = self.file_manager.get_all_records
+
+    # -------------------------------
+    # SEQUENTIAL FILE
+    # -------------------------------
+    def _add_sequential(self, record: Record):
+        # SequentialIndex maneja su propia escritura de archivos
+        # Le pasamos el objeto Record COMPLETO
+        self.index.insert(record.key, record)
+
+    def _update_sequential(self, key: Any, new_values: List[Any]) -> bool:
+        # Sobrescribe la ranura existente; solo si cambia la llave se
+        # elimina y reinserta (la búsqueda ya verifica que exista)
+        return self.index.update_inplace(key, Record(self.table, new_values))
+
+    # -------------------------------
+    # B+ / ISAM (FileManager + índice de posiciones)
+    # -------------------------------
+    # Mientras el índice no se haya construido, las inserciones solo se
+    # escriben en el .dat: la construcción por lotes en _ensure_index las
+    # recoge junto con el resto del archivo.
+    def _add_indexed(self, record: Record):
+        pos = self.file_manager.add_record(record)
+        if self._index_loaded:
+            self.index.insert(record.key, pos)
+
+    def _add_many_indexed(self, records: List[Record]):
+        positions = self.file_manager.add_records(records)
+        if not self._index_loaded:
+            return
+        pairs = [(record.key, pos) for record, pos in zip(records, positions)]
+        if self.index_type == 'bplus':
+            self.index.insert_many(pairs)
         else:
-            return self.file_manager.get_all_records()
+            for key, pos in pairs:
+                self.index.insert(key, pos)
+
+    def _get_indexed(self, key: Any) -> Union[Record, None]:
+        pos = self.index.search(key)
+        if pos is not None:
+            return self.file_manager.read_record(pos)
+        return None
+
+    def _update_indexed(self, key: Any, new_values: List[Any]) -> bool:
+        pos = self.index.search(key)
+        if pos is None:
+            return False
+        new_record = Record(self.table, new_values, pos=pos)
+        self.file_manager._write_record_at_pos(new_record, pos)
+        return True
+
+    def _remove_indexed(self, key: Any) -> bool:
+        pos = self.index.search(key)
+        if pos is not None and self.file_manager.remove_record(pos):
+            self.index.delete(key)
+            return True
+        return False
+
+    def _range_indexed(self, start_key: Any, end_key: Any) -> List[Record]:
+        # Las posiciones contiguas se leen en bloque (ver read_records_at)
+        positions = [pos for _, pos in self.index.range_search(start_key, end_key)]
+        records = self.file_manager.read_records_at(positions)
+        return [record for record in records if record and record.next == 0]
+
+    def close(self):
+        """Libera los descriptores abiertos por el archivo de datos y el índice."""
+        if self.file_manager:
+            self.file_manager.close()
+        if hasattr(self.index, 'close'):
+            self.index.close()
+
+    def _maybe_checkpoint(self, ops: int = 1):
+        """Guarda el índice completo cada `_checkpoint_every` operaciones."""
+        self._ops_since_checkpoint += ops
+        if self._ops_since_checkpoint >= self._checkpoint_every:
+            if self._index_loaded:
+                self.index.save_to_file()
+            if self.file_manager:
+                self.file_manager.checkpoint()
+            self._ops_since_checkpoint = 0
 
     def save_all(self):
-        """Fuerza el guardado de todos los datos."""
-        self.index.save_to_file()
+        """Fuerza el guardado de todos los datos (checkpoint del índice)."""
+        # Un índice aún no construido no se guarda: se persistiría vacío
+        if self._index_loaded:
+            self.index.save_to_file()
+        if self.file_manager:
+            self.file_manager.checkpoint()
+        self._ops_since_checkpoint = 0
         print("Datos guardados en memoria secundaria.")
  
     def get_index_info(self) -> dict:
-        """Obtiene información sobre el estado del índice."""
+        """Obtiene información sobre el estado del índice (cacheada hasta la próxima mutación)."""
+        if self._info_cache is None:
+            self._ensure_index()
+            self._info_cache = self._compute_index_info()
+        return dict(self._info_cache)
+
+    def _compute_index_info(self) -> dict:
+        """Calcula la información del índice recorriendo la estructura."""
         
         if self.index_type == 'sequential':
             # Información específica para Sequential File
             try:
-                main_size = os.path.getsize(self.index.data_filename) // self.index.record_size if os.path.exists(self.index.data_filename) else 0
+                main_size = self.index.data_records_count
                 aux_size = self.index.aux_records_count
                 return {
                     'index_type': 'sequential',
                     'total_keys': main_size + aux_size,
                     'main_file_records': main_size,
                     'aux_file_records': aux_size,
-                    'k_threshold': self.index.K_threshold,
+                    'k_threshold': self.index.rebuild_threshold(),
                     'is_empty': self.index.is_empty()
                 }
             except Exception as e:
@@ -241,20 +317,17 @@ class DatabaseManager:
                     pass
 
             # Fallback para ISAMIndex
-            idx_l3 = getattr(self.index, 'idx_l3', None)
-            overflow = getattr(self.index, 'overflow', None)
+            leaf_keys = getattr(self.index, 'keys', None)
+            overflow = getattr(self.index, 'overflow_pos', None)
             order = getattr(self.index, 'order', None)
 
-            if idx_l3 is not None:
-                total_keys = len(idx_l3)
-                if isinstance(overflow, dict):
-                    extra_positions = sum(len(v) for v in overflow.values())
-                else:
-                    extra_positions = 0
+            if leaf_keys is not None:
+                total_keys = len(leaf_keys)
+                extra_positions = len(overflow) if overflow is not None else 0
                 if order and order > 0:
-                    leaf_nodes = (len(idx_l3) + order - 1) // order
+                    leaf_nodes = (len(leaf_keys) + order - 1) // order
                 else:
-                    leaf_nodes = len(idx_l3)
+                    leaf_nodes = len(leaf_keys)
                 return {
                     **base_info,
                     'total_keys': total_keys + extra_positions,
@@ -1,42 +1,475 @@
 import os
+from pathlib import Path
+import mmap
+import queue
 import struct
-from typing import Union, List
+import threading
+from typing import Union, List, Iterator
 from core.models import Table, Record
 
+# Consejos de acceso para los recorridos completos: lectura anticipada
+# agresiva y, si el kernel lo soporta, cargar las páginas de una vez.
+_SCAN_ADVICE = tuple(
+    getattr(mmap, name) for name in ('MADV_SEQUENTIAL', 'MADV_POPULATE_READ', 'MADV_WILLNEED')
+    if hasattr(mmap, name)
+)
+
+# Para los accesos puntuales por posición la lectura anticipada no ayuda
+_POINT_ADVICE = tuple(getattr(mmap, name) for name in ('MADV_RANDOM',) if hasattr(mmap, name))
+
+
+def _advise(mm: mmap.mmap, advice):
+    """Aplica madvise ignorando plataformas/kernels que no lo soportan."""
+    if not hasattr(mm, 'madvise'):
+        return
+    for flag in advice:
+        try:
+            mm.madvise(flag)
+        except OSError:
+            pass
+
+
+# Flags para el descriptor de larga vida del FileManager
+_OPEN_FLAGS = os.O_RDWR | os.O_CREAT | getattr(os, 'O_CLOEXEC', 0) | getattr(os, 'O_BINARY', 0)
+_FADV_RANDOM = getattr(os, 'POSIX_FADV_RANDOM', None)
+
+
+def _pwrite(fd: int, data: bytes, offset: int):
+    """Escritura posicional; en plataformas sin pwrite usa lseek + write."""
+    if hasattr(os, 'pwrite'):
+        os.pwrite(fd, data, offset)
+    else:
+        os.lseek(fd, offset, os.SEEK_SET)
+        os.write(fd, data)
+
+
+def _consecutive_runs(ordered: List[int]) -> Iterator[tuple]:
+    """Parte una lista ordenada de posiciones en corridas consecutivas [i, j)."""
+    i = 0
+    while i < len(ordered):
+        j = i + 1
+        while j < len(ordered) and ordered[j] == ordered[j - 1] + 1:
+            j += 1
+        yield i, j
+        i = j
+
+
+def iter_packed_rows(filename: str, table: Table, count: int = None) -> Iterator[tuple]:
+    """
+    Recorre secuencialmente un archivo de registros de tamaño fijo.
+
+    Mapea el archivo en memoria (mmap de solo lectura con MADV_SEQUENTIAL)
+    y lo desempaqueta entero con `struct.iter_unpack`, que recorre el buffer
+    en C y entrega una tupla por registro (el último campo es `next`). Así
+    se puede filtrar por validez sin construir un Record por fila. Si el
+    archivo no existe o está vacío no devuelve nada. `count` limita el
+    recorrido a los primeros registros (p. ej. sin la zona reservada).
+    """
+    return _iter_unpack_file(filename, table.record_size, table.record_struct, count)
+
+
+def iter_key_and_flag(filename: str, table: Table, count: int = None) -> Iterator[tuple]:
+    """
+    Como `iter_packed_rows` pero cada tupla es solo (key, next): el resto
+    de campos se salta con bytes de relleno (ver Table.key_flag_struct).
+    """
+    rows = _iter_unpack_file(filename, table.record_size, table.key_flag_struct, count)
+    if table.fields[table.index].data_type == str:
+        for key, next_ptr in rows:
+            yield key.decode('utf-8').rstrip('\x00'), next_ptr
+    else:
+        yield from rows
+
+
+def _iter_unpack_file(filename: str, rs: int, unpacker: struct.Struct, count: int = None) -> Iterator[tuple]:
+    try:
+        f = open(filename, 'rb')
+    except FileNotFoundError:
+        return
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        n = size // rs if count is None else min(size // rs, count)
+        if n <= 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _advise(mm, _SCAN_ADVICE)
+            with memoryview(mm) as mv, mv[:n * rs] as body:
+                rows = unpacker.iter_unpack(body)
+                try:
+                    yield from rows
+                finally:
+                    del rows
+
+
+def iter_packed_records(filename: str, table: Table, count: int = None) -> Iterator[Record]:
+    """Igual que `iter_packed_rows` pero materializando cada fila como Record."""
+    for row in iter_packed_rows(filename, table, count):
+        yield Record.unpack_from_row(table, row)
+
+
 class FileManager:
-    HEADER_SIZE = 4  
+    # Cabecera: (cabeza de la free list, número lógico de registros). Las
+    # cabeceras antiguas solo traen la cabeza (4 bytes).
+    HEADER_STRUCT = struct.Struct('ii')
+    HEADER_SIZE = HEADER_STRUCT.size
+    # El archivo de datos crece de a bloques de este número de registros
+    PREALLOC_RECORDS = 4096
+    # Marca (campo next) de los slots reservados que nunca se escribieron
+    UNWRITTEN_NEXT = -2
+    UNWRITTEN_COMPACT = 2
+    __slots__ = ('filename', 'header_filename', 'table', 'record_size',
+                 'free_list_head', 'file_size', '_fd', '_header_fd',
+                 '_write_batch', '_pending', '_mm', '_free_stack', '_free_set', '_next_struct',
+                 '_header_dirty', '_allocated', '_write_q', '_writer', '_inflight',
+                 '_inflight_lock', '_unwritten_slot', '_write_error')
     
-    def __init__(self, filename: str, table: Table):
+    def __init__(self, filename: str, table: Table, write_batch: int = 0, async_writes: bool = False):
         self.filename = filename
-        self.header_filename = filename.replace('.dat', '.header')
+        self.header_filename = str(Path(filename).with_suffix('.header'))
         self.table = table
         self.record_size = table.record_size
         self.free_list_head = -1
-        self.file_size = 0
+        # Copia en memoria de la free list (el tope es free_list_head): asignar
+        # un hueco es un pop, sin leer el registro eliminado desde disco
+        self._free_stack = []
+        self._free_set = set()  # mismas posiciones, para saber si un slot ya está libre
+        # El puntero next (o la marca de eliminado) es el último campo del registro
+        self._next_struct = struct.Struct(table.next_code)
+        # Slot reservado y aún no escrito: ceros con un next que ningún
+        # registro usa (vivo = 0, eliminado = -1/posición o 1 compacto). Así
+        # la recuperación distingue la zona reservada de registros en cero
+        unwritten_next = self.UNWRITTEN_COMPACT if table.compact_tombstone else self.UNWRITTEN_NEXT
+        self._unwritten_slot = (bytes(self.record_size - self._next_struct.size)
+                                + self._next_struct.pack(unwritten_next))
+        self.file_size = 0  # registros lógicos; el archivo puede tener slots reservados de más
+        self._allocated = 0  # slots que ocupa físicamente el archivo
+        self._fd = None
+        self._mm = None  # mmap de solo lectura del .dat para lecturas puntuales
+        self._header_fd = None  # Se abre en la primera escritura de la cabecera
+        # La cabecera se reescribe en checkpoint()/close() y al reutilizar un
+        # hueco de la free list, no en cada operación
+        self._header_dirty = False
+        # write_batch > 0: las escrituras de registros se encolan (pos -> bytes)
+        # y se vuelcan juntas en flush(); 0 = escritura inmediata
+        self._write_batch = write_batch
+        self._pending = {}
+        # async_writes: los pwrite los hace un hilo escritor que consume una
+        # cola acotada; _inflight cuenta las escrituras pendientes por slot
+        self._write_q = None
+        self._writer = None
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Primer error de escritura del hilo escritor; se relanza en el
+        # siguiente flush()/checkpoint()/close() o _submit
+        self._write_error = None
 
         self._initialize_files()
+
+        # Un solo descriptor abierto durante toda la vida del FileManager:
+        # las escrituras usan pwrite y las lecturas un mmap sobre él (_view).
+        # Los recorridos completos van por mmap (iter_packed_rows).
+        self._fd = os.open(self.filename, _OPEN_FLAGS, 0o644)
+        self._fadvise(_FADV_RANDOM)
+
+        if async_writes:
+            self._write_q = queue.Queue(maxsize=1024)
+            self._writer = threading.Thread(target=self._drain, daemon=True)
+            self._writer.start()
+
+    def _fadvise(self, advice):
+        """Indica al kernel el patrón de acceso del descriptor (si se soporta)."""
+        if advice is None or not hasattr(os, 'posix_fadvise'):
+            return
+        try:
+            os.posix_fadvise(self._fd, 0, 0, advice)
+        except OSError:
+            pass
+
+    def flush(self):
+        """
+        Vuelca las escrituras encoladas y, con async_writes, espera a que el
+        hilo escritor termine: al volver todo está escrito en el archivo.
+        """
+        self._flush_pending()
+        if self._write_q is not None:
+            self._write_q.join()
+            self._raise_write_error()
+
+    def _raise_write_error(self):
+        """Relanza (una vez) el error que tuvo el hilo escritor, como lo haría el pwrite directo."""
+        error, self._write_error = self._write_error, None
+        if error is not None:
+            raise error
+
+    def _flush_pending(self):
+        """
+        Envía las escrituras de write_batch: se ordenan por posición y cada
+        corrida de slots consecutivos sale en un solo pwrite.
+        """
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        ordered = sorted(pending)
+        for i, j in _consecutive_runs(ordered):
+            buf = b''.join(pending[pos] for pos in ordered[i:j])
+            self._submit(self._get_byte_offset(ordered[i]), buf)
+
+    def _submit(self, offset: int, data: bytes):
+        """Escribe `data` en `offset`: directo, o encolado al hilo escritor."""
+        if self._write_q is None:
+            _pwrite(self._fd, data, offset)
+            return
+        self._raise_write_error()
+        with self._inflight_lock:
+            for pos in self._slots_of(offset, len(data)):
+                self._inflight[pos] = self._inflight.get(pos, 0) + 1
+        self._write_q.put((offset, data))
+
+    def _slots_of(self, offset: int, length: int) -> range:
+        return range(offset // self.record_size, (offset + length - 1) // self.record_size + 1)
+
+    def _drain(self):
+        """Bucle del hilo escritor: hace los pwrite en el orden en que se encolaron."""
+        while True:
+            item = self._write_q.get()
+            try:
+                if item is None:
+                    return
+                offset, data = item
+                try:
+                    _pwrite(self._fd, data, offset)
+                except OSError as e:
+                    # sin print: el primero se relanza en el hilo principal
+                    if self._write_error is None:
+                        self._write_error = e
+                with self._inflight_lock:
+                    for pos in self._slots_of(offset, len(data)):
+                        left = self._inflight.pop(pos) - 1
+                        if left:
+                            self._inflight[pos] = left
+            finally:
+                self._write_q.task_done()
+
+    def checkpoint(self):
+        """Vuelca las escrituras encoladas y, si cambió, la cabecera (free list)."""
+        self.flush()
+        if self._header_dirty:
+            self._write_header()
+            self._header_dirty = False
+
+    def _view(self, end: int):
+        """
+        Devuelve el mmap de solo lectura del archivo de datos. Si `end`
+        (en bytes) queda fuera de lo mapeado y el archivo creció, se
+        remapea; None si el archivo está vacío. Las escrituras con pwrite
+        se ven en el mapeo porque comparten la caché de páginas.
+        """
+        mm = self._mm
+        if mm is not None and len(mm) >= end:
+            return mm
+        size = os.fstat(self._fd).st_size
+        if mm is not None:
+            if len(mm) == size:
+                return mm
+            mm.close()
+            self._mm = None
+        if size == 0:
+            return None
+        self._mm = mm = mmap.mmap(self._fd, 0, access=mmap.ACCESS_READ)
+        _advise(mm, _POINT_ADVICE)
+        return mm
+
+    def close(self, checkpoint: bool = True):
+        """
+        Cierra los descriptores del archivo de datos y de la cabecera.
+
+        Con checkpoint=False no se escribe la cabecera, no se vuelcan las
+        escrituras de write_batch ni se recortan los slots reservados: los
+        archivos quedan como si el proceso hubiera muerto aquí (sirve para
+        probar la recuperación).
+        """
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        try:
+            if self._fd is not None and checkpoint:
+                # un error de escritura pendiente se relanza, pero los
+                # descriptores se cierran igual
+                self.checkpoint()
+        finally:
+            self._close_fds(trim=checkpoint)
+
+    def _close_fds(self, trim: bool = True):
+        if self._fd is not None:
+            if self._writer is not None:
+                self._write_q.put(None)
+                self._writer.join()
+                self._writer = None
+                self._write_q = None
+            # Devolver los slots reservados que no se llegaron a usar
+            if trim and self._allocated > self.file_size:
+                try:
+                    os.ftruncate(self._fd, self._get_byte_offset(self.file_size))
+                    self._allocated = self.file_size
+                except OSError:
+                    pass
+            os.close(self._fd)
+            self._fd = None
+        if self._header_fd is not None:
+            os.close(self._header_fd)
+            self._header_fd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def _initialize_files(self):
+        count = None
+        header_missing = False
+        data = b''
         try: 
             with open(self.header_filename, 'rb') as f:
-                data = f.read(self.HEADER_SIZE)
-                if len(data) == self.HEADER_SIZE:
-                    self.free_list_head = struct.unpack('i', data)[0]
-                else:
-                    self.free_list_head = -1 
+                data = f.read()
+            if len(data) >= self.HEADER_SIZE:
+                self.free_list_head, count = self.HEADER_STRUCT.unpack_from(data)
+            elif len(data) >= 4:
+                self.free_list_head = struct.unpack('i', data[:4])[0]
+            else:
+                self.free_list_head = -1 
         except FileNotFoundError:
             self.free_list_head = -1
-            self._write_header()
+            header_missing = True
 
         if os.path.exists(self.filename):
             file_bytes = os.path.getsize(self.filename)
-            self.file_size = file_bytes // self.record_size
+            self._allocated = file_bytes // self.record_size
+            self.file_size = self._logical_size(count)
         else:
+            self._allocated = 0
             self.file_size = 0
 
+        if header_missing:
+            self._write_header()
+
+        if self.table.compact_tombstone:
+            self._load_free_positions(data[self.HEADER_SIZE:])
+        else:
+            self._load_free_stack()
+
+    def _logical_size(self, count) -> int:
+        """
+        Número de registros en uso. Sin contador en la cabecera (formato
+        antiguo) son todos los slots del archivo. Con contador, además se
+        recuperan los registros añadidos después del último checkpoint: son
+        los slots desde `count` hasta el primero que conserva la marca de
+        reservado (ver _reserve), sin importar si el registro es todo ceros.
+        """
+        if count is None:
+            return self._allocated
+        count = max(0, min(count, self._allocated))
+        if count == self._allocated:
+            return count
+        marker = self._unwritten_slot[-self._next_struct.size:]
+        flag = struct.Struct(f'={self.record_size - len(marker)}x{len(marker)}s')
+        with open(self.filename, 'rb') as f:
+            f.seek(self._get_byte_offset(count))
+            tail = f.read(self._get_byte_offset(self._allocated - count))
+        usable = len(tail) - len(tail) % self.record_size
+        for n, (next_bytes,) in enumerate(flag.iter_unpack(tail[:usable])):
+            if next_bytes == marker:
+                return count + n
+        return count + usable // self.record_size
+
+    def _reserve(self, n: int):
+        """
+        Garantiza espacio físico para `n` registros más al final. El archivo
+        se extiende de a PREALLOC_RECORDS slots en vez de crecer un registro
+        por escritura. Los slots reservados se escriben con la marca de "no
+        escrito" (un pwrite por bloque) y la cabecera guarda el contador en
+        ese momento, así tras una caída _logical_size solo revisa desde ahí.
+        """
+        needed = self.file_size + n
+        if needed <= self._allocated:
+            return
+        chunk = self.PREALLOC_RECORDS
+        new_allocated = -(-needed // chunk) * chunk
+        # (si antes falló una reserva, los slots hasta file_size ya son registros)
+        try:
+            for start in range(max(self._allocated, self.file_size), new_allocated, chunk):
+                count = min(chunk, new_allocated - start)
+                _pwrite(self._fd, self._unwritten_slot * count, self._get_byte_offset(start))
+        except OSError:
+            # Si no se puede reservar se sigue creciendo con cada escritura
+            return
+        self._allocated = new_allocated
+        self._write_header()
+
+    def _load_free_stack(self):
+        """
+        Recorre una sola vez la cadena de eliminados (leyendo solo el campo
+        next de cada slot) y la deja en _free_stack con la cabeza al tope.
+        Como en _load_free_positions, solo se aceptan slots que siguen
+        marcados como eliminados: la cadena se corta en el primer slot con
+        next == 0 (vivo) o ya visitado, por si la cabecera quedó
+        desactualizada o corrupta. Lo que quede fuera solo se pierde como
+        hueco reutilizable, nunca se entrega un slot en uso.
+        """
+        chain = []
+        seen = set()
+        pos = self.free_list_head
+        if pos != -1 and self.file_size > 0:
+            next_off = self.record_size - self._next_struct.size
+            with open(self.filename, 'rb') as f:
+                while 0 <= pos < self.file_size and pos not in seen:
+                    f.seek(self._get_byte_offset(pos) + next_off)
+                    data = f.read(self._next_struct.size)
+                    if len(data) < self._next_struct.size:
+                        break
+                    next_ptr = self._next_struct.unpack(data)[0]
+                    if next_ptr == 0:
+                        break
+                    chain.append(pos)
+                    seen.add(pos)
+                    pos = next_ptr
+        chain.reverse()
+        self._free_stack = chain
+        self._free_set = set(chain)
+
+    def _load_free_positions(self, data: bytes):
+        """
+        Con compact_tombstone la free list está en la cabecera como un
+        arreglo de int32 (el tope al final). Solo se aceptan las posiciones
+        cuyo slot sigue marcado como eliminado, por si la cabecera quedó
+        desactualizada tras una caída.
+        """
+        n = len(data) // 4
+        stack = []
+        if n and self.file_size > 0:
+            flag_off = self.record_size - self._next_struct.size
+            with open(self.filename, 'rb') as f:
+                for pos in struct.unpack(f'{n}i', data[:n * 4]):
+                    if not 0 <= pos < self.file_size:
+                        continue
+                    f.seek(self._get_byte_offset(pos) + flag_off)
+                    flag = f.read(self._next_struct.size)
+                    if flag and self._next_struct.unpack(flag)[0] != 0:
+                        stack.append(pos)
+        self._free_stack = stack
+        self._free_set = set(stack)
+        self.free_list_head = stack[-1] if stack else -1
+
     def _write_header(self):
         try:
-            with open(self.header_filename, 'wb') as f:
-                f.write(struct.pack('i', self.free_list_head))
+            if self._header_fd is None:
+                self._header_fd = os.open(self.header_filename, _OPEN_FLAGS, 0o644)
+            data = self.HEADER_STRUCT.pack(self.free_list_head, self.file_size)
+            if self.table.compact_tombstone:
+                stack = self._free_stack
+                data += struct.pack(f'{len(stack)}i', *stack)
+                os.ftruncate(self._header_fd, len(data))
+            _pwrite(self._header_fd, data, 0)
         except Exception as e:
             print(f"Error al escribir la cabecera: {e}")
 
@@ -44,75 +477,191 @@ class FileManager:
         return pos * self.record_size
     
     def add_record(self, record: Record) -> int:
-        if self.free_list_head != -1:
-            pos_to_use = self.free_list_head
-            
-            record_at_pos = self.read_record(pos_to_use)
-            self.free_list_head = record_at_pos.next 
-            
+        if self._free_stack:
+            pos_to_use = self._free_stack.pop()
+            self._free_set.discard(pos_to_use)
+            self.free_list_head = self._free_stack[-1] if self._free_stack else -1
+
+            # Al reutilizar un hueco la cabecera se escribe en el acto (antes
+            # que el registro): una cabeza vieja apuntando a un slot ya en
+            # uso lo volvería a entregar tras una caída. Si la caída llega
+            # entre ambas escrituras el slot solo queda sin reutilizar
+            self._write_header()
+            self._header_dirty = False
+
             record.next = 0 
             self._write_record_at_pos(record, pos_to_use)
             
-            self._write_header() 
-            
             return pos_to_use
         else:
             pos_to_use = self.file_size
+            self._reserve(1)
             record.next = 0 
             self._write_record_at_pos(record, pos_to_use)
             
             self.file_size += 1 
+            self._header_dirty = True
             
             return pos_to_use
         
+    def add_records(self, records: List[Record]) -> List[int]:
+        """
+        Añade varios registros. Primero se reutilizan los huecos de la free
+        list; el resto se empaqueta en un solo buffer y se escribe al final
+        del archivo con una única llamada. Devuelve las posiciones asignadas.
+        """
+        positions = []
+        i = 0
+        while i < len(records) and self._free_stack:
+            positions.append(self.add_record(records[i]))
+            i += 1
+
+        rest = records[i:]
+        if rest:
+            for record in rest:
+                record.next = 0
+            buf = b''.join(record.pack() for record in rest)
+
+            self._reserve(len(rest))
+            self._submit(self._get_byte_offset(self.file_size), buf)
+
+            positions.extend(range(self.file_size, self.file_size + len(rest)))
+            self.file_size += len(rest)
+            self._header_dirty = True
+
+        return positions
+
     def read_record(self, pos: int) -> Union[Record, None]:
             try:
-                with open(self.filename, 'rb') as f:
+                data = self._pending.get(pos)
+                if data is not None:
+                    record = Record.unpack(self.table, data)
+                elif not 0 <= pos < self.file_size:
+                    # fuera de los registros en uso (o en la zona reservada)
+                    return None
+                else:
+                    with self._inflight_lock:
+                        unwritten = pos in self._inflight
+                    if unwritten:
+                        # el hilo escritor aún no escribió este slot (un
+                        # error suyo queda pendiente para flush/checkpoint)
+                        self._write_q.join()
+                    # Lectura directa desde el mmap: sin syscall ni bytes intermedio
                     offset = self._get_byte_offset(pos)
-                    f.seek(offset)
-                    data = f.read(self.record_size)
-                    
-                    if len(data) == self.record_size:
-                        record = Record.unpack(self.table, data)
-                        record.pos = pos 
-                        return record
-            except FileNotFoundError:
-                print(f"Error: Archivo de datos '{self.filename}' no encontrado.")
+                    mm = self._view(offset + self.record_size)
+                    if mm is None or offset + self.record_size > len(mm):
+                        return None
+                    record = Record.unpack_from(self.table, mm, offset)
+                record.pos = pos 
+                return record
             except Exception as e:
                 print(f"Error al leer registro en pos {pos}: {e}")
                 
             return None
 
+    def read_records_at(self, positions: List[int]) -> List[Union[Record, None]]:
+        """
+        Lee varios registros por posición, en el mismo orden recibido.
+
+        Las posiciones se ordenan y se agrupan en corridas consecutivas;
+        cada corrida se copia del mmap en un solo slice y se desempaqueta con
+        struct.iter_unpack. Si se pide más de la mitad del archivo se hace
+        un solo recorrido completo en vez de muchas corridas cortas. Las
+        posiciones fuera del archivo dan None.
+        """
+        self.flush()
+        rs = self.record_size
+        found = {}
+        ordered = sorted(p for p in set(positions) if 0 <= p < self.file_size)
+        if ordered and len(ordered) * 2 >= self.file_size:
+            wanted = set(ordered)
+            for pos, row in enumerate(self.iter_rows()):
+                if pos in wanted:
+                    record = Record.unpack_from_row(self.table, row)
+                    record.pos = pos
+                    found[pos] = record
+            return [found.get(pos) for pos in positions]
+        mm = self._view((ordered[-1] + 1) * rs) if ordered else None
+        if mm is None:
+            return [None] * len(positions)
+        for i, j in _consecutive_runs(ordered):
+            start = ordered[i]
+            buf = mm[start * rs:(start + j - i) * rs]
+            usable = len(buf) - len(buf) % rs
+            for pos, row in enumerate(self.table.record_struct.iter_unpack(buf[:usable]), start):
+                record = Record.unpack_from_row(self.table, row)
+                record.pos = pos
+                found[pos] = record
+        return [found.get(pos) for pos in positions]
+
     def _write_record_at_pos(self, record: Record, pos: int):
-        # Crear el archivo si no existe
-        if not os.path.exists(self.filename):
-            with open(self.filename, 'wb') as f:
-                pass  # Crear archivo vacío
-        
-        with open(self.filename, 'r+b') as f:
-            offset = self._get_byte_offset(pos)
-            f.seek(offset)
-            f.write(record.pack())
+        if self._write_batch:
+            self._pending[pos] = record.pack()
+            if len(self._pending) >= self._write_batch:
+                self._flush_pending()
+        else:
+            self._submit(self._get_byte_offset(pos), record.pack())
     
+    def _write_next(self, pos: int, next_ptr: int):
+        """Escribe solo los 4 bytes del puntero next del slot `pos`."""
+        packed = self._next_struct.pack(next_ptr)
+        data = self._pending.get(pos)
+        if data is not None:
+            self._pending[pos] = data[:-len(packed)] + packed
+        else:
+            self._submit(self._get_byte_offset(pos) + self.record_size - len(packed), packed)
+
     def remove_record(self, pos: int) -> bool:
-        record = self.read_record(pos)
-        if record is None or record.next != 0:
+        # Si ya está en la free list no hace falta leer el registro
+        if pos < 0 or pos >= self.file_size or pos in self._free_set:
             return False
 
-        record.next = self.free_list_head
-        
-        self._write_record_at_pos(record, pos)
+        # Marcar el slot como eliminado encadenándolo a la free list (con
+        # compact_tombstone basta la marca: la lista va en la cabecera)
+        self._write_next(pos, 1 if self.table.compact_tombstone else self.free_list_head)
         
+        self._free_stack.append(pos)
+        self._free_set.add(pos)
         self.free_list_head = pos
         
-        self._write_header()
+        self._header_dirty = True
         
         return True
+    def iter_records_sequential(self) -> Iterator[Record]:
+        """Recorre todos los slots del archivo en orden (incluye eliminados)."""
+        self.flush()
+        for pos, record in enumerate(iter_packed_records(self.filename, self.table, self.file_size)):
+            record.pos = pos
+            yield record
+
+    def iter_rows(self) -> Iterator[tuple]:
+        """Recorre todos los slots como tuplas crudas (incluye eliminados)."""
+        self.flush()
+        return iter_packed_rows(self.filename, self.table, self.file_size)
+
+    def iter_key_and_flag(self) -> Iterator[tuple]:
+        """Recorre todos los slots como tuplas (key, next) (incluye eliminados)."""
+        self.flush()
+        return iter_key_and_flag(self.filename, self.table, self.file_size)
+
+    def scan_tuples(self) -> Iterator[tuple]:
+        """
+        Recorre los registros válidos como pares (pos, tupla cruda), sin
+        construir Records: para recorridos que solo miran algunos campos.
+        """
+        for pos, row in enumerate(self.iter_rows()):
+            # incluimos  solo los que existen y no estan eliminados
+            if row[-1] == 0:
+                yield pos, row
+
     def get_all_records(self) -> List[Record]:
+        # Un solo recorrido sobre el archivo mapeado en vez de un read por
+        # slot; el filtro de eliminados se hace sobre la tupla cruda
+        table = self.table
+        unpack = Record.unpack_from_row
         all_records = []
-        for idx in range(self.file_size):
-            record = self.read_record(idx)
-            # incluimos  solo los que existen y no estan eliminados
-            if record and record.next == 0: 
-                all_records.append(record)
+        for pos, row in self.scan_tuples():
+            record = unpack(table, row)
+            record.pos = pos
+            all_records.append(record)
         return all_records
\ No newline at end of file
@@ -3,6 +3,8 @@ from typing import List, Any, Type, Union
 
 
 class Field:
+    __slots__ = ('name', 'data_type', 'size')
+
     def __init__(self, name: str, data_type: Type, size: int = 0):
         self.name = name
         self.data_type = data_type
@@ -12,34 +14,65 @@ class Field:
         return f"Field(name={self.name}, type={self.data_type.__name__}, size={self.size})"
     
 class Table:
-    def __init__(self, name: str, fields: List[Field], key_field: str):
+    def __init__(self, name: str, fields: List[Field], key_field: str, compact_tombstone: bool = False):
         self.name = name
         self.fields = fields
         self.key_field = key_field
         self.index = [f.name for f in fields].index(key_field)
-        self.record_size = self._calculate_record_size()
+        # compact_tombstone: el último campo es un byte (0 vivo / 1 eliminado)
+        # en vez del int `next`; la free list se guarda aparte en la cabecera
+        self.compact_tombstone = compact_tombstone
+        self.next_code = "B" if compact_tombstone else "i"
+        # El formato se compila una sola vez en un Struct (reutilizado por
+        # pack/unpack y los recorridos) y de él sale el tamaño
         self.format_string = self._generate_format_string()
+        self.record_struct = struct.Struct(self.format_string)
+        self.record_size = self._calculate_record_size()
+        self.key_flag_struct = self._build_key_flag_struct()
+        # Índices de los campos str (los únicos que necesitan encode/decode)
+        self.str_field_indices = tuple(i for i, f in enumerate(fields) if f.data_type == str)
 
     def _calculate_record_size(self) -> int:
-        # Usar struct.calcsize para obtener el tamaño real con padding
-        format_string = self._generate_format_string()
-        return struct.calcsize(format_string)
+        # Tamaño real con padding, ya calculado por el Struct compilado
+        return self.record_struct.size
     
+    @staticmethod
+    def _field_code(field: Field) -> str:
+        if field.data_type == int:
+            return "i"
+        elif field.data_type == float:
+            return "f"
+        elif field.data_type == str:
+            return f"{field.size}s"
+        raise ValueError(f"Tipo de dato no soportado: {field.data_type}")
+
     def _generate_format_string(self) -> str:  ## lo necesitamos para que struct funcione (por ejemplo "i10s" para un int y un string de 10 caracteres)
         parseStruct = ""
         for field in self.fields:
-            if field.data_type == int:
-                parseStruct += "i"
-            elif field.data_type == float:
-                parseStruct += "f"
-            elif field.data_type == str:
-                parseStruct += f"{field.size}s"
-            else:
-                raise ValueError(f"Tipo de dato no soportado: {field.data_type}")
+            parseStruct += self._field_code(field)
      
-        return parseStruct + "i"  # para el next
+        return parseStruct + self.next_code  # para el next (o la marca de eliminado)
+
+    def _build_key_flag_struct(self) -> struct.Struct:
+        """
+        Struct que lee solo (key, next) de un registro y salta el resto con
+        bytes de relleno 'x'. Los offsets salen del formato nativo (con su
+        padding), así que el tamaño coincide con record_size.
+        """
+        codes = [self._field_code(f) for f in self.fields] + [self.next_code]
+
+        def offset(i):
+            return struct.calcsize("".join(codes[:i + 1])) - struct.calcsize(codes[i])
+
+        key_code = codes[self.index]
+        key_off = offset(self.index)
+        next_off = offset(len(codes) - 1)
+        gap = next_off - key_off - struct.calcsize(key_code)
+        return struct.Struct(f"={key_off}x{key_code}{gap}x{self.next_code}")
     
 class Record: 
+    __slots__ = ('table', 'values', 'next', 'pos')
+
     def __init__(self, table: Table, values: List[any], next: int = 0, pos: int = -1):
         self.table = table
         self.values = values
@@ -51,28 +84,29 @@ class Record:
         return self.values[self.table.index]
     
     def pack(self) -> bytes:
-        pack_values = []
-
-        for i, fields in enumerate(self.table.fields):
-            value = self.values[i]
-            if fields.data_type == str:
-                pack_values.append(value.encode('utf-8').ljust(fields.size, b'\x00'))
-            else:
-                pack_values.append(value)
-        pack_values.append(self.next)
-        return struct.pack(self.table.format_string, * pack_values)
+        table = self.table
+        pack_values = list(self.values[:len(table.fields)])
+        # 'Ns' rellena con \x00 hasta N, así que basta con codificar
+        for i in table.str_field_indices:
+            pack_values[i] = pack_values[i].encode('utf-8')
+        return table.record_struct.pack(*pack_values, self.next)
     
     @staticmethod
     def unpack(table: Table, data: bytes) -> 'Record':
-        unpacked_values = list(struct.unpack(table.format_string, data))
-        values = []
-        for i, field in enumerate(table.fields):
-            value = unpacked_values[i]
-            if field.data_type == str:
-                values.append(value.decode('utf-8').rstrip('\x00'))
-            else:
-                values.append(value)
-        next_ptr = unpacked_values[-1]
+        return Record.unpack_from_row(table, table.record_struct.unpack(data))
+
+    @staticmethod
+    def unpack_from(table: Table, buf, offset: int) -> 'Record':
+        """Desempaqueta directamente desde un buffer (p. ej. un mmap) sin copiar el slot."""
+        return Record.unpack_from_row(table, table.record_struct.unpack_from(buf, offset))
+
+    @staticmethod
+    def unpack_from_row(table: Table, row: tuple) -> 'Record':
+        """Construye el Record a partir de la tupla ya desempaquetada por struct."""
+        values = list(row[:-1])
+        for i in table.str_field_indices:
+            values[i] = values[i].decode('utf-8').rstrip('\x00')
+        next_ptr = row[-1]
         record = Record(table, values, next=next_ptr)
         return record
     def __repr__(self) -> str:
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Tests del FileManager: free list, preallocación y recuperación tras una
+caída (cerrar sin checkpoint), en los dos formatos de marca de eliminado.
+"""
+
+import os
+import sys
+import struct
+import tempfile
+import unittest
+from unittest import mock
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.models import Table, Field, Record
+from core.file_manager import FileManager
+
+
+class TestFileManager(unittest.TestCase):
+    """Tests de persistencia del FileManager (next int de 4 bytes)."""
+
+    compact = False
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'tabla.dat')
+        self.table = Table('tabla', [Field('id', int), Field('nombre', str, 8)], 'id',
+                           compact_tombstone=self.compact)
+        self.open_managers = []
+
+    def tearDown(self):
+        for fm in self.open_managers:
+            fm.close()
+        self.tmp.cleanup()
+
+    def _open(self, **kwargs) -> FileManager:
+        fm = FileManager(self.filename, self.table, **kwargs)
+        self.open_managers.append(fm)
+        return fm
+
+    def _record(self, key, name='r'):
+        return Record(self.table, [key, name])
+
+    def _live(self, fm):
+        return [(r.pos, r.values[0]) for r in fm.get_all_records()]
+
+    def test_free_list_survives_reopen(self):
+        """Test que los huecos de un cierre limpio se reutilizan al reabrir (último borrado primero)."""
+        fm = self._open()
+        for i in range(10):
+            fm.add_record(self._record(i))
+        for pos in (3, 7, 2):
+            self.assertTrue(fm.remove_record(pos))
+        fm.close()
+
+        fm = self._open()
+        self.assertEqual(fm.file_size, 10)
+        self.assertEqual([fm.add_record(self._record(100 + i)) for i in range(4)], [2, 7, 3, 10])
+        self.assertEqual(sorted(k for _, k in self._live(fm)),
+                         [0, 1, 4, 5, 6, 8, 9, 100, 101, 102, 103])
+
+    def test_reused_slot_not_handed_out_after_crash(self):
+        """Test que reutilizar un hueco y caer antes del checkpoint no pisa registros vivos."""
+        fm = self._open()
+        for i in range(10):
+            fm.add_record(self._record(i))
+        fm.remove_record(5)
+        fm.checkpoint()
+        self.assertEqual(fm.add_record(self._record(555)), 5)
+        fm.close(checkpoint=False)
+
+        fm = self._open()
+        new_positions = [fm.add_record(self._record(900 + i)) for i in range(2)]
+        self.assertEqual(new_positions, [10, 11])
+        self.assertEqual(self._live(fm), [(0, 0), (1, 1), (2, 2), (3, 3), (4, 4), (5, 555),
+                                          (6, 6), (7, 7), (8, 8), (9, 9), (10, 900), (11, 901)])
+
+    def test_stale_header_pointing_to_live_slot(self):
+        """Test que una cabecera vieja que apunta a un slot vivo no entrega ese slot."""
+        fm = self._open()
+        for i in range(4):
+            fm.add_record(self._record(i))
+        fm.close()
+        with open(fm.header_filename, 'r+b') as f:
+            f.write(struct.pack('ii', 2, 4))
+
+        fm = self._open()
+        self.assertEqual(fm.add_record(self._record(9)), 4)
+        self.assertEqual([k for _, k in self._live(fm)], [0, 1, 2, 3, 9])
+
+    def test_appends_after_checkpoint_recovered(self):
+        """Test que los registros añadidos tras el checkpoint se recuperan, aunque sean todo ceros."""
+        fm = self._open()
+        fm.add_record(self._record(1, 'a'))
+        fm.checkpoint()
+        fm.add_record(self._record(0, ''))
+        fm.add_record(self._record(0, ''))
+        fm.close(checkpoint=False)
+
+        fm = self._open()
+        self.assertEqual(fm.file_size, 3)
+        self.assertEqual([r.values for r in fm.get_all_records()], [[1, 'a'], [0, ''], [0, '']])
+
+    def test_preallocation_across_reopen(self):
+        """Test que los bloques reservados no cuentan como registros y se recortan al cerrar."""
+        rs = self.table.record_size
+        fm = self._open()
+        n = FileManager.PREALLOC_RECORDS + 10
+        self.assertEqual(len(fm.add_records([self._record(i) for i in range(n)])), n)
+        fm.add_record(self._record(n))
+        self.assertEqual(os.path.getsize(self.filename), 2 * FileManager.PREALLOC_RECORDS * rs)
+        fm.close(checkpoint=False)
+
+        fm = self._open()
+        self.assertEqual(fm.file_size, n + 1)
+        self.assertEqual(len(fm.get_all_records()), n + 1)
+        self.assertIsNone(fm.read_record(n + 1))
+        fm.close()
+        self.assertEqual(os.path.getsize(self.filename), (n + 1) * rs)
+
+        fm = self._open()
+        self.assertEqual(fm.file_size, n + 1)
+        self.assertEqual(fm.add_record(self._record(-1)), n + 1)
+
+    def test_async_write_error_is_raised(self):
+        """Test que un error del hilo escritor se relanza una vez en flush() y en close()."""
+        fm = self._open(async_writes=True)
+        fm.add_record(self._record(1))
+        fm.flush()
+        with mock.patch('core.file_manager._pwrite', side_effect=OSError('disco lleno')):
+            fm.add_record(self._record(2))
+            with self.assertRaises(OSError):
+                fm.flush()
+            fm.flush()  # ya se informó
+            fm.add_record(self._record(3))
+            with self.assertRaises(OSError):
+                fm.close()
+        fm.close()  # los descriptores ya se cerraron
+
+
+class TestFileManagerCompact(TestFileManager):
+    """Los mismos tests con la marca de eliminado de 1 byte (free list en la cabecera)."""
+
+    compact = True
+
+    def test_stale_header_pointing_to_live_slot(self):
+        """Test que una posición vieja de la free list en la cabecera no entrega un slot vivo."""
+        fm = self._open()
+        for i in range(4):
+            fm.add_record(self._record(i))
+        fm.close()
+        with open(fm.header_filename, 'r+b') as f:
+            f.write(struct.pack('iii', 2, 4, 2))
+
+        fm = self._open()
+        self.assertEqual(fm.add_record(self._record(9)), 4)
+        self.assertEqual([k for _, k in self._live(fm)], [0, 1, 2, 3, 9])
+
+
+if __name__ == '__main__':
+    unittest.main()
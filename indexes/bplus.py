@@ -1,11 +1,17 @@
-import pickle
 import os
+from pathlib import Path
+import mmap
 import struct
+from contextlib import contextmanager
+from bisect import bisect_left, bisect_right
 from typing import List, Any, Optional
 from core.file_manager import FileManager
 from core.models import Table, Record
 
 class BPlusTreeNode:
+    # Sin __dict__: menos memoria por nodo y acceso a atributos más rápido
+    __slots__ = ('order', 'is_leaf', 'keys', 'children', 'next', 'node_id')
+
     def __init__(self, order, is_leaf=False):
         self.order = order
         self.is_leaf = is_leaf
@@ -15,13 +21,83 @@ class BPlusTreeNode:
         self.node_id = None  # ID único para persistencia
 
 
+# -------------------------------
+# NÚCLEO DE BÚSQUEDA
+# -------------------------------
+# La comparación de claves dentro de cada nodo se delega a `bisect`, cuyo
+# bucle interno está implementado en C; así el recorrido raíz→hoja solo paga
+# el intérprete una vez por nivel y no una vez por clave.
+
+def _find_leaf(node: BPlusTreeNode, key) -> BPlusTreeNode:
+    """Desciende desde `node` hasta la hoja que debería contener `key`."""
+    while not node.is_leaf:
+        # hijo i contiene las claves en [keys[i-1], keys[i])
+        node = node.children[bisect_right(node.keys, key)]
+    return node
+
+
+def _leaf_index(leaf: BPlusTreeNode, key) -> int:
+    """Índice de `key` dentro de la hoja, o -1 si no está."""
+    keys = leaf.keys
+    i = bisect_left(keys, key)
+    if i < len(keys) and keys[i] == key:
+        return i
+    return -1
+
+
+def _pack_bounds(n: int, fill: int, min_fill: int, capacity: int):
+    """Reparte `n` entradas en grupos consecutivos de ~`fill` elementos.
+
+    Los grupos quedan lo más parejos posible y ninguno baja de `min_fill`
+    (salvo que solo haya uno) ni supera `capacity`.
+    """
+    groups = max(1, -(-n // fill))
+    while groups > 1 and n // groups < min_fill and -(-n // (groups - 1)) <= capacity:
+        groups -= 1
+    base, extra = divmod(n, groups)
+    bounds = []
+    start = 0
+    for g in range(groups):
+        end = start + base + (1 if g < extra else 0)
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
 class BPlusTreePersistence:
-    """Maneja la persistencia del árbol B+ usando archivos separados."""
+    """
+    Maneja la persistencia del árbol B+ en un archivo binario de nodos.
+
+    El .idx tiene una cabecera (magic, order, root_id, node_counter) seguida
+    de un slot de tamaño fijo por nodo, en `HEADER + (node_id - 1) * NODE_SIZE`.
+    Cada slot guarda (is_leaf, nkeys, keys[order+1], children[order+2], next_id);
+    en las hojas `children` son posiciones del .dat y en los nodos internos
+    son node_ids. Un checkpoint solo reescribe los nodos marcados como sucios.
+    """
+    MAGIC = b'BPT1'
+    HEADER = struct.Struct('=4siii')
     
     def __init__(self, index_filename: str, table: Table):
         self.index_filename = index_filename
         self.table = table
         self.node_counter = 0
+        self.dirty = set()  # Nodos modificados desde el último checkpoint
+        self._file_ready = False  # El .idx en disco corresponde a este árbol
+        self._node_struct = None
+        self._order = None
+
+        # Codificación de la llave según el campo llave de la tabla. Las
+        # llaves float van como double ('d'), no con el 'f' de la fila: en
+        # float32 una llave como 1.1 no vuelve igual y no se encontraría
+        key_field = table.fields[table.index]
+        self._key_code = 'd' if key_field.data_type == float else Table._field_code(key_field)
+        self._key_is_str = key_field.data_type == str
+        self._empty_key = b'' if self._key_is_str else (0.0 if key_field.data_type == float else 0)
+
+        # Log de operaciones (append-only) entre checkpoints: (op, key, pos)
+        self.log_filename = index_filename + 'log'
+        self._log_struct = struct.Struct(f'=c{self._key_code}i')
+        self._wal = None
         self._initialize_index_metadata()
     
     def _initialize_index_metadata(self):
@@ -55,59 +131,187 @@ class BPlusTreePersistence:
         """Genera un ID único para cada nodo."""
         self.node_counter += 1
         return self.node_counter
-    
-    def _assign_node_ids(self, node: BPlusTreeNode):
-        """Asigna IDs únicos a todos los nodos del árbol."""
+
+    def _set_layout(self, order: int):
+        """Prepara el struct de nodo para el orden dado."""
+        if self._order != order:
+            self._order = order
+            self._node_struct = struct.Struct(
+                '=BH' + self._key_code * (order + 1) + 'i' * (order + 2) + 'i')
+
+    def _node_offset(self, node_id: int) -> int:
+        return self.HEADER.size + (node_id - 1) * self._node_struct.size
+
+    def _id_of(self, node: BPlusTreeNode) -> int:
         if node.node_id is None:
             node.node_id = self._generate_node_id()
-        
-        if not node.is_leaf:
-            for child in node.children:
-                if isinstance(child, BPlusTreeNode):
-                    self._assign_node_ids(child)
-    
+        return node.node_id
+
+    def _encode_key(self, key):
+        return key.encode('utf-8') if self._key_is_str else key
+
+    def _decode_key(self, key):
+        return key.decode('utf-8').rstrip('\x00') if self._key_is_str else key
+
+    def _pack_node(self, node: BPlusTreeNode) -> bytes:
+        order = self._order
+        keys = [self._encode_key(k) for k in node.keys]
+        keys += [self._empty_key] * (order + 1 - len(keys))
+        if node.is_leaf:
+            children = list(node.children)
+            next_id = self._id_of(node.next) if node.next else -1
+        else:
+            children = [self._id_of(child) for child in node.children]
+            next_id = -1
+        children += [-1] * (order + 2 - len(children))
+        return self._node_struct.pack(1 if node.is_leaf else 0, len(node.keys),
+                                      *keys, *children, next_id)
     
     def save_tree(self, tree: 'BPlusTree'):
-        """Guarda el árbol B+ completo usando pickle para el índice."""
-        # Asignar IDs a todos los nodos
-        self._assign_node_ids(tree.root)
-        self.root_id = tree.root.node_id
-        
-        # Serializar el árbol completo
-        tree_data = {
-            'root': tree.root,
-            'order': tree.order,
-            'node_counter': self.node_counter
-        }
-        
-        with open(self.index_filename, 'wb') as f:
-            pickle.dump(tree_data, f)
+        """
+        Checkpoint del árbol: escribe los nodos sucios en su slot y la
+        cabecera. Si el archivo aún no corresponde a este árbol (o cambió el
+        orden) se reescribe completo con IDs compactos.
+        """
+        if not self._file_ready or self._order != tree.order:
+            self._set_layout(tree.order)
+            # Reescritura completa: IDs nuevos para todos los nodos vivos
+            for node in tree._free_nodes:
+                node.node_id = None
+            self.node_counter = 0
+            nodes = []
+            stack = [tree.root]
+            while stack:
+                node = stack.pop()
+                node.node_id = None
+                nodes.append(node)
+                if not node.is_leaf:
+                    stack.extend(node.children)
+            mode = 'wb'
+        else:
+            nodes = list(self.dirty)
+            mode = 'r+b'
+
+        self.root_id = self._id_of(tree.root)
+        # Empaquetar primero: puede asignar IDs a hijos/hojas nuevas
+        packed = sorted((self._id_of(node), self._pack_node(node)) for node in nodes)
+        with open(self.index_filename, mode) as f:
+            for node_id, data in packed:
+                f.seek(self._node_offset(node_id))
+                f.write(data)
+            f.seek(0)
+            f.write(self.HEADER.pack(self.MAGIC, self._order, self.root_id, self.node_counter))
+        self.dirty.clear()
+        self._file_ready = True
         
         # Guardar metadatos
         self._save_index_metadata()
+        
+        # El .idx ya refleja todas las operaciones registradas
+        self.clear_log()
+    
+    def append_log(self, *entries: tuple):
+        """Añade operaciones (op, key, pos) al final del log."""
+        if self._wal is None:
+            self._wal = open(self.log_filename, 'ab')
+        pack = self._log_struct.pack
+        self._wal.write(b''.join(
+            pack(op.encode(), self._encode_key(key), -1 if pos is None else pos)
+            for op, key, pos in entries))
+        self._wal.flush()
+    
+    def read_log(self) -> List[tuple]:
+        """Lee las operaciones pendientes del log (ignora una cola truncada)."""
+        try:
+            with open(self.log_filename, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        data = data[:len(data) - len(data) % self._log_struct.size]
+        return [(op.decode(), self._decode_key(key), pos)
+                for op, key, pos in self._log_struct.iter_unpack(data)]
+    
+    def clear_log(self):
+        """Vacía el log tras un checkpoint."""
+        self.close_log()
+        if os.path.exists(self.log_filename):
+            open(self.log_filename, 'wb').close()
+    
+    def close_log(self):
+        """Cierra el archivo del log si está abierto."""
+        if self._wal is not None:
+            self._wal.close()
+            self._wal = None
     
     def load_tree(self) -> Optional['BPlusTree']:
-        """Carga el árbol B+ desde archivo pickle."""
+        """Carga el árbol B+ desde el archivo binario de nodos."""
         if not os.path.exists(self.index_filename):
             return None
         
         try:
             with open(self.index_filename, 'rb') as f:
-                tree_data = pickle.load(f)
-            
-            tree = BPlusTree(tree_data['order'], self.index_filename, self.table)
-            tree.root = tree_data['root']
-            self.node_counter = tree_data.get('node_counter', 0)
-            
-            return tree
+                if os.fstat(f.fileno()).st_size < self.HEADER.size:
+                    return None
+                # Los nodos se desempaquetan directamente del archivo mapeado,
+                # sin copiar antes el .idx entero a un bytes
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    return self._load_nodes(data)
         except Exception as e:
             print(f"Error al cargar el árbol B+: {e}")
             return None
+
+    def _load_nodes(self, data) -> Optional['BPlusTree']:
+        """Reconstruye los nodos alcanzables desde la raíz a partir del buffer."""
+        magic, order, root_id, node_counter = self.HEADER.unpack_from(data)
+        if magic != self.MAGIC:
+            print(f"Error al cargar el árbol B+: formato de '{self.index_filename}' no reconocido")
+            return None
+        self._set_layout(order)
+        
+        # Materializar los nodos alcanzables desde la raíz
+        nodes = {}
+        next_ids = []
+        unpack_from = self._node_struct.unpack_from
+        stack = [root_id]
+        while stack:
+            node_id = stack.pop()
+            row = unpack_from(data, self._node_offset(node_id))
+            is_leaf, nkeys = row[0], row[1]
+            node = BPlusTreeNode(order, is_leaf=bool(is_leaf))
+            node.node_id = node_id
+            keys = row[2:2 + nkeys]
+            node.keys = [self._decode_key(k) for k in keys] if self._key_is_str else list(keys)
+            base = 2 + order + 1
+            if is_leaf:
+                node.children = list(row[base:base + nkeys])
+                next_ids.append((node, row[-1]))
+            else:
+                node.children = list(row[base:base + nkeys + 1])
+                stack.extend(node.children)
+            nodes[node_id] = node
+        
+        # Enlazar hijos y hojas por ID
+        for node in nodes.values():
+            if not node.is_leaf:
+                node.children = [nodes[child_id] for child_id in node.children]
+        for leaf, next_id in next_ids:
+            leaf.next = nodes.get(next_id) if next_id != -1 else None
+        
+        tree = BPlusTree(order)
+        tree.root = nodes[root_id]
+        tree.persistence = self
+        self.node_counter = node_counter
+        self.root_id = root_id
+        self.dirty.clear()
+        self._file_ready = True
+        
+        return tree
     
 
 
 class BPlusTree:
-    def __init__(self, order=4, index_filename: str = None, table: Table = None):
+    def __init__(self, order=4, index_filename: str = None, table: Table = None,
+                 async_writes: bool = False):
         self.root = BPlusTreeNode(order, is_leaf=True)
         self.order = order
         self.table = table
@@ -116,12 +320,42 @@ class BPlusTree:
         
         if index_filename and table:
             # Crear FileManager para datos
-            data_filename = index_filename.replace('.idx', '.dat')
-            self.data_file_manager = FileManager(data_filename, table)
+            data_filename = str(Path(index_filename).with_suffix('.dat'))
+            # async_writes: las escrituras del .dat van a un hilo aparte y se
+            # solapan con la inserción en el árbol (ver FileManager)
+            self.data_file_manager = FileManager(data_filename, table, async_writes=async_writes)
             # Crear persistencia para el índice
             self.persistence = BPlusTreePersistence(index_filename, table)
         
-        self._auto_save = True  # Guardar automáticamente después de cada operación
+        self._auto_save = True  # Registrar cada operación en el log de persistencia
+        self._ops_since_checkpoint = 0
+        self._checkpoint_every = 10000  # Operaciones entre reescrituras completas del .idx
+        self._free_nodes = []  # Nodos liberados por merges, listos para reutilizar
+
+    def _new_node(self, is_leaf: bool) -> BPlusTreeNode:
+        """Obtiene un nodo vacío, reutilizando uno liberado si lo hay."""
+        if self._free_nodes:
+            node = self._free_nodes.pop()
+            node.order = self.order
+            node.is_leaf = is_leaf
+        else:
+            node = BPlusTreeNode(self.order, is_leaf=is_leaf)
+        self._touch(node)
+        return node
+
+    def _release_node(self, node: BPlusTreeNode):
+        """Devuelve un nodo que ya no forma parte del árbol al pool."""
+        node.keys = []
+        node.children = []
+        node.next = None
+        if self.persistence:
+            self.persistence.dirty.discard(node)
+        self._free_nodes.append(node)
+
+    def _touch(self, *nodes: BPlusTreeNode):
+        """Marca nodos modificados para que el próximo checkpoint los reescriba."""
+        if self.persistence:
+            self.persistence.dirty.update(nodes)
 
     def is_empty(self):
         """Check if the BPlus tree is empty."""
@@ -171,11 +405,9 @@ class BPlusTree:
         if not self.data_file_manager:
             raise ValueError("FileManager no inicializado")
         
-        pos = self.search(key)
+        # Eliminar del índice (una sola bajada: delete devuelve la posición)
+        pos = self.delete(key)
         if pos is not None:
-            # Eliminar del índice
-            self.delete(key)
-            
             # Eliminar de la tabla
             return self.data_file_manager.remove_record(pos)
         return False
@@ -192,15 +424,10 @@ class BPlusTree:
         if not self.data_file_manager:
             raise ValueError("FileManager no inicializado")
         
-        positions = self.range_search(start_key, end_key)
-        records = []
-        
-        for key, pos in positions:
-            record = self.data_file_manager.read_record(pos)
-            if record:
-                records.append(record)
-        
-        return records
+        # Las posiciones se leen en bloque (ver FileManager.read_records_at)
+        positions = [pos for _, pos in self.range_search(start_key, end_key)]
+        records = self.data_file_manager.read_records_at(positions)
+        return [record for record in records if record]
     
     def load_from_file(self):
         """Carga el árbol desde el archivo de persistencia."""
@@ -212,34 +439,90 @@ class BPlusTree:
                 if loaded_tree.persistence:
                     self.persistence.node_counter = loaded_tree.persistence.node_counter
                     self.persistence.root_id = loaded_tree.persistence.root_id
-                return True
+            # Reaplicar las operaciones posteriores al último checkpoint
+            replayed = self._replay_log()
+            return bool(loaded_tree) or replayed
         return False
     
+    def _replay_log(self) -> bool:
+        """Aplica las operaciones del log sobre el árbol cargado."""
+        entries = self.persistence.read_log()
+        auto_save, self._auto_save = self._auto_save, False
+        try:
+            for op, key, pos in entries:
+                if op == 'i':
+                    self.insert(key, pos)
+                elif op == 'u':
+                    self.update(key, pos)
+                else:
+                    self.delete(key)
+        finally:
+            self._auto_save = auto_save
+        self._ops_since_checkpoint = len(entries)
+        return bool(entries)
+    
     def save_to_file(self):
-        """Guarda el árbol en el archivo de persistencia."""
+        """Guarda el árbol en el archivo de persistencia (checkpoint)."""
         if self.persistence:
             self.persistence.save_tree(self)
+            self._ops_since_checkpoint = 0
+        if self.data_file_manager:
+            self.data_file_manager.checkpoint()
+    
+    def close(self, checkpoint: bool = True):
+        """
+        Libera el archivo del log y el de datos; el árbol sigue siendo
+        recuperable. checkpoint=False se pasa al FileManager (ver
+        FileManager.close).
+        """
+        if self.persistence:
+            self.persistence.close_log()
+        if self.data_file_manager:
+            self.data_file_manager.close(checkpoint)
     
     def _auto_save_if_enabled(self):
         """Guarda automáticamente si está habilitado."""
         if self._auto_save and self.persistence:
             self.save_to_file()
 
+    @contextmanager
+    def batched(self):
+        """
+        Agrupa varias operaciones: dentro del bloque no se registra nada en
+        el log y al salir se hace un solo checkpoint (solo nodos sucios).
+        """
+        auto_save, self._auto_save = self._auto_save, False
+        try:
+            yield self
+        finally:
+            self._auto_save = auto_save
+            self.save_to_file()
+
+    def bulk_insert(self, pairs):
+        """Inserta un lote de (key, pos) ordenado por llave con un solo checkpoint."""
+        with self.batched():
+            self.insert_many(pairs)
+
+    def _log_operation(self, op: str, key, pos=None):
+        """
+        Registra la operación en el log en lugar de reescribir todo el .idx.
+        Cada `_checkpoint_every` operaciones se hace un guardado completo.
+        """
+        if not (self._auto_save and self.persistence):
+            return
+        self._ops_since_checkpoint += 1
+        if self._ops_since_checkpoint >= self._checkpoint_every:
+            self.save_to_file()
+        else:
+            self.persistence.append_log((op, key, pos))
+
     # -------------------------------
     # BÚSQUEDA
     # -------------------------------
     def search(self, key, node=None):
-        node = node or self.root
-        if node.is_leaf:
-            for i, item in enumerate(node.keys):
-                if item == key:
-                    return node.children[i]  # Return position
-            return None
-        else:
-            for i, item in enumerate(node.keys):
-                if key < item:
-                    return self.search(key, node.children[i])
-            return self.search(key, node.children[-1])
+        leaf = _find_leaf(node or self.root, key)
+        i = _leaf_index(leaf, key)
+        return leaf.children[i] if i >= 0 else None  # Return position
 
     def range_search(self, start, end):
         """Search for all keys in the range [start, end] and return list of (key, pos) tuples."""
@@ -247,18 +530,25 @@ class BPlusTree:
         if self.is_empty():
             return result
         
-        # Find the first leaf node
-        node = self.root
-        while not node.is_leaf:
-            node = node.children[0]
+        # Bajar directamente a la hoja donde empieza el rango
+        node = _find_leaf(self.root, start)
+        lo = bisect_left(node.keys, start)
         
-        # Traverse all leaf nodes
+        # Recorrer hojas enlazadas copiando slices completos; solo se
+        # compara contra `end` una vez por hoja
+        extend = result.extend
         while node:
-            for i, key in enumerate(node.keys):
-                if start <= key <= end:
-                    result.append((key, node.children[i]))
-                elif key > end:
-                    break
+            keys = node.keys
+            if lo == 0 and keys and keys[-1] <= end:
+                # hoja entera dentro del rango: sin bisect ni copias
+                extend(zip(keys, node.children))
+                node = node.next
+                continue
+            hi = bisect_right(keys, end)
+            extend(zip(keys[lo:hi], node.children[lo:hi]))
+            if hi < len(keys):
+                break
+            lo = 0
             node = node.next
         
         return result
@@ -267,73 +557,166 @@ class BPlusTree:
     # INSERCIÓN
     # -------------------------------
     def insert(self, key, pos):
-        root = self.root
-        new_child = self._insert_recursive(root, key, pos)
-        if new_child:
-            new_root = BPlusTreeNode(self.order, is_leaf=False)
-            new_root.keys = [new_child[0]]
-            new_root.children = [root, new_child[1]]
-            self.root = new_root
-        
-        # Guardar automáticamente después de la inserción
-        self._auto_save_if_enabled()
+        # Bajar de forma iterativa guardando el camino (padre, índice del hijo)
+        path = []
+        node = self.root
+        while not node.is_leaf:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
 
-    def _insert_recursive(self, node, key, pos):
-        if node.is_leaf:
-            # ya existe la clave
-            if key in node.keys:
-                idx = node.keys.index(key)
-                node.children[idx] = pos  # Update position
-                return None
-            # insertar nueva clave
-            i = 0
-            while i < len(node.keys) and node.keys[i] < key:
-                i += 1
+        self._touch(node)
+        i = bisect_left(node.keys, key)
+        # ya existe la clave
+        if i < len(node.keys) and node.keys[i] == key:
+            node.children[i] = pos  # Update position
+        else:
+            # insertar nueva clave y propagar los splits hacia arriba
             node.keys.insert(i, key)
             node.children.insert(i, pos)
             if len(node.keys) > self.order:
-                return self._split_leaf(node)
-            return None
-        else:
-            # bajar recursivamente
-            i = 0
-            while i < len(node.keys) and key >= node.keys[i]:
+                self._split_path(path, node)
+
+        # Registrar la inserción en el log
+        self._log_operation('i', key, pos)
+
+    def insert_many(self, pairs):
+        """
+        Inserta un lote de pares (key, pos).
+
+        Ordena el lote una vez y mantiene el camino raíz→hoja: mientras la
+        siguiente clave caiga en el rango de la hoja actual se inserta ahí
+        directamente, y solo se vuelve a bajar desde la raíz tras un split
+        o al salir del rango de la hoja.
+        """
+        pairs = sorted(pairs, key=lambda e: e[0])
+        i, n = 0, len(pairs)
+        while i < n:
+            # Bajar guardando el camino y el límite superior de la hoja
+            path = []
+            upper = None
+            node = self.root
+            while not node.is_leaf:
+                j = bisect_right(node.keys, pairs[i][0])
+                if j < len(node.keys):
+                    upper = node.keys[j]
+                path.append((node, j))
+                node = node.children[j]
+
+            while i < n:
+                key, pos = pairs[i]
+                if upper is not None and key >= upper:
+                    break
+                self._touch(node)
+                k = bisect_left(node.keys, key)
+                if k < len(node.keys) and node.keys[k] == key:
+                    node.children[k] = pos  # Update position
+                else:
+                    node.keys.insert(k, key)
+                    node.children.insert(k, pos)
                 i += 1
-            new_child = self._insert_recursive(node.children[i], key, pos)
-            if new_child:
-                new_key, new_node = new_child
-                node.keys.insert(i, new_key)
-                node.children.insert(i + 1, new_node)
                 if len(node.keys) > self.order:
-                    return self._split_internal(node)
-            return None
+                    self._split_path(path, node)
+                    break
+
+        if self._auto_save and self.persistence and pairs:
+            self._ops_since_checkpoint += len(pairs)
+            if self._ops_since_checkpoint >= self._checkpoint_every:
+                self.save_to_file()
+            else:
+                self.persistence.append_log(*(('i', key, pos) for key, pos in pairs))
+
+    def _split_path(self, path, leaf):
+        """Divide una hoja desbordada y propaga los splits por el camino guardado."""
+        new_child = self._split_leaf(leaf)
+        while new_child and path:
+            parent, j = path.pop()
+            self._touch(parent)
+            parent.keys.insert(j, new_child[0])
+            parent.children.insert(j + 1, new_child[1])
+            new_child = self._split_internal(parent) if len(parent.keys) > self.order else None
+        if new_child:
+            new_root = self._new_node(is_leaf=False)
+            new_root.keys = [new_child[0]]
+            new_root.children = [self.root, new_child[1]]
+            self.root = new_root
+
+    # -------------------------------
+    # CARGA MASIVA
+    # -------------------------------
+    @classmethod
+    def bulk_load(cls, entries, order=4, index_filename: str = None, table: Table = None,
+                  fill_factor: float = 0.75) -> 'BPlusTree':
+        """
+        Construye el árbol de abajo hacia arriba a partir de pares (key, pos).
+
+        Ordena una sola vez, empaqueta las hojas al `fill_factor` y arma cada
+        nivel interno con la primera clave de cada hijo, en lugar de pagar
+        un insert (con sus splits) por cada registro.
+        """
+        tree = cls(order, index_filename, table)
+
+        # Si una clave se repite gana la última posición, igual que en insert()
+        pairs = []
+        for key, pos in sorted(entries, key=lambda e: e[0]):
+            if pairs and pairs[-1][0] == key:
+                pairs[-1] = (key, pos)
+            else:
+                pairs.append((key, pos))
+
+        if pairs:
+            min_keys = (order + 1) // 2
+            fill = max(min_keys, int(order * fill_factor))
+
+            # Hojas enlazadas
+            level = []
+            first_keys = []
+            prev = None
+            for start, end in _pack_bounds(len(pairs), fill, min_keys, order):
+                leaf = tree._new_node(is_leaf=True)
+                leaf.keys = [k for k, _ in pairs[start:end]]
+                leaf.children = [p for _, p in pairs[start:end]]
+                if prev is not None:
+                    prev.next = leaf
+                prev = leaf
+                level.append(leaf)
+                first_keys.append(leaf.keys[0])
+
+            # Niveles internos hasta que quede una sola raíz
+            while len(level) > 1:
+                parents = []
+                parent_first_keys = []
+                for start, end in _pack_bounds(len(level), fill + 1, min_keys + 1, order + 1):
+                    node = tree._new_node(is_leaf=False)
+                    node.children = level[start:end]
+                    node.keys = first_keys[start + 1:end]
+                    parents.append(node)
+                    parent_first_keys.append(first_keys[start])
+                level = parents
+                first_keys = parent_first_keys
+
+            tree.root = level[0]
+
+        tree._auto_save_if_enabled()
+        return tree
 
     def update(self, key, pos):
         """Update the position for an existing key."""
-        if self.search(key) is not None:
-            self._update_recursive(self.root, key, pos)
-            # Guardar automáticamente después de la actualización
-            self._auto_save_if_enabled()
+        leaf = _find_leaf(self.root, key)
+        i = _leaf_index(leaf, key)
+        if i >= 0:
+            leaf.children[i] = pos
+            self._touch(leaf)
+            # Registrar la actualización en el log
+            self._log_operation('u', key, pos)
         else:
             # If key doesn't exist, insert it
             self.insert(key, pos)
 
-    def _update_recursive(self, node, key, pos):
-        if node.is_leaf:
-            for i, item in enumerate(node.keys):
-                if item == key:
-                    node.children[i] = pos
-                    return
-        else:
-            for i, item in enumerate(node.keys):
-                if key < item:
-                    self._update_recursive(node.children[i], key, pos)
-                    return
-            self._update_recursive(node.children[-1], key, pos)
-
     def _split_leaf(self, node):
+        self._touch(node)
         mid = len(node.keys) // 2
-        new_node = BPlusTreeNode(self.order, is_leaf=True)
+        new_node = self._new_node(is_leaf=True)
         new_node.keys = node.keys[mid:]
         new_node.children = node.children[mid:]
         node.keys = node.keys[:mid]
@@ -345,8 +728,9 @@ class BPlusTree:
         return new_node.keys[0], new_node
 
     def _split_internal(self, node):
+        self._touch(node)
         mid = len(node.keys) // 2
-        new_node = BPlusTreeNode(self.order, is_leaf=False)
+        new_node = self._new_node(is_leaf=False)
         new_node.keys = node.keys[mid + 1:]
         new_node.children = node.children[mid + 1:]
 
@@ -360,59 +744,76 @@ class BPlusTree:
     # ELIMINACIÓN
     # -------------------------------
     def delete(self, key):
-        self._delete_recursive(self.root, key)
-        # si la raíz se queda sin claves y no es hoja, se baja un nivel
-        if not self.root.is_leaf and len(self.root.keys) == 0:
-            self.root = self.root.children[0]
-        
-        # Guardar automáticamente después de la eliminación
-        self._auto_save_if_enabled()
+        """Elimina `key` del índice y devuelve su posición (None si no estaba)."""
+        path = []
+        node = self.root
+        while not node.is_leaf:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
 
-    def _delete_recursive(self, node, key):
-        if node.is_leaf:
-            if key in node.keys:
-                idx = node.keys.index(key)
-                node.children.pop(idx)
-                node.keys.pop(idx)
-            return
+        idx = _leaf_index(node, key)
+        if idx < 0:
+            return None
+        pos = node.children.pop(idx)
+        node.keys.pop(idx)
+        self._touch(node)
 
-        # nodo interno
-        i = 0
-        while i < len(node.keys) and key >= node.keys[i]:
-            i += 1
-        self._delete_recursive(node.children[i], key)
+        # balancear de abajo hacia arriba siguiendo el camino guardado
+        min_keys = (self.order + 1) // 2
+        while path:
+            parent, i = path.pop()
+            if len(parent.children[i].keys) < min_keys:
+                self._rebalance(parent, i)
 
-        # balancear si es necesario
-        if len(node.children[i].keys) < (self.order + 1) // 2:
-            self._rebalance(node, i)
+        # si la raíz se queda sin claves y no es hoja, se baja un nivel
+        if not self.root.is_leaf and len(self.root.keys) == 0:
+            old_root = self.root
+            self.root = old_root.children[0]
+            self._release_node(old_root)
+        
+        # Registrar la eliminación en el log
+        self._log_operation('d', key)
+        return pos
 
     def _rebalance(self, parent, idx):
         child = parent.children[idx]
         if idx > 0:  # tiene hermano izquierdo
             left = parent.children[idx - 1]
             if len(left.keys) > (self.order + 1) // 2:
-                # rotar desde la izquierda
+                self._touch(parent, child, left)
+                # rotar desde la izquierda (asignación por slice: un solo
+                # desplazamiento a nivel C en lugar de insert(0)/pop)
                 if child.is_leaf:
-                    child.keys.insert(0, left.keys.pop(-1))
-                    child.children.insert(0, left.children.pop(-1))
+                    child.keys[:0] = left.keys[-1:]
+                    del left.keys[-1]
+                    child.children[:0] = left.children[-1:]
+                    del left.children[-1]
                     parent.keys[idx - 1] = child.keys[0]
                 else:
-                    child.keys.insert(0, parent.keys[idx - 1])
-                    parent.keys[idx - 1] = left.keys.pop(-1)
-                    child.children.insert(0, left.children.pop(-1))
+                    child.keys[:0] = parent.keys[idx - 1:idx]
+                    parent.keys[idx - 1] = left.keys[-1]
+                    del left.keys[-1]
+                    child.children[:0] = left.children[-1:]
+                    del left.children[-1]
                 return
         if idx < len(parent.children) - 1:  # tiene hermano derecho
             right = parent.children[idx + 1]
             if len(right.keys) > (self.order + 1) // 2:
+                self._touch(parent, child, right)
                 # rotar desde la derecha
                 if child.is_leaf:
-                    child.keys.append(right.keys.pop(0))
-                    child.children.append(right.children.pop(0))
+                    child.keys.append(right.keys[0])
+                    del right.keys[:1]
+                    child.children.append(right.children[0])
+                    del right.children[:1]
                     parent.keys[idx] = right.keys[0]
                 else:
                     child.keys.append(parent.keys[idx])
-                    parent.keys[idx] = right.keys.pop(0)
-                    child.children.append(right.children.pop(0))
+                    parent.keys[idx] = right.keys[0]
+                    del right.keys[:1]
+                    child.children.append(right.children[0])
+                    del right.children[:1]
                 return
 
         # si no hay redistribución posible → merge
@@ -424,6 +825,7 @@ class BPlusTree:
     def _merge(self, parent, idx):
         child = parent.children[idx]
         sibling = parent.children[idx + 1]
+        self._touch(parent, child)
 
         if child.is_leaf:
             child.keys.extend(sibling.keys)
@@ -436,6 +838,7 @@ class BPlusTree:
 
         parent.keys.pop(idx)
         parent.children.pop(idx + 1)
+        self._release_node(sibling)
 
     # -------------------------------
     # UTILIDADES
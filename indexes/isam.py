@@ -1,6 +1,11 @@
+import io
 import struct
 import pickle
 import os
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+from pathlib import Path
 
 # Constantes de tamaño de bloque/índice
 IDX_ENTRY_SIZE = struct.calcsize('ii')
@@ -8,110 +13,215 @@ IDX_PAGE_HEADER = struct.calcsize('i')
 IDX_BLOCK_FACTOR = (4096 - IDX_PAGE_HEADER) // IDX_ENTRY_SIZE
 
 
+_LENGTH = struct.Struct('=q')
+
+
+def _pack_column(values):
+    # Columna como array binario: 'q' enteros, 'd' números con decimales y
+    # 's' llaves str (UTF-8 con el largo de cada una delante, en un array
+    # 'q'). Devuelve (código, bytes)
+    if all(type(v) is int and -2 ** 63 <= v < 2 ** 63 for v in values):
+        return b'q', array('q', values).tobytes()
+    if all(type(v) in (int, float) for v in values):
+        return b'd', array('d', values).tobytes()
+    if all(type(v) is str for v in values):
+        encoded = [v.encode('utf-8') for v in values]
+        lengths = array('q', map(len, encoded))
+        return b's', b''.join((_LENGTH.pack(len(lengths)), lengths.tobytes(), *encoded))
+    raise TypeError("columna del ISAM con valores que no son int, float ni str")
+
+
+def _unpack_column(code, data):
+    if code == b's':
+        (n,) = _LENGTH.unpack_from(data)
+        lengths = array('q')
+        lengths.frombytes(data[_LENGTH.size:_LENGTH.size + 8 * n])
+        offset = _LENGTH.size + 8 * n
+        values = []
+        for length in lengths:
+            values.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return values
+    if code not in (b'q', b'd'):
+        raise ValueError(f"código de columna {code!r} no soportado")
+    column = array(code.decode())
+    column.frombytes(data)
+    return column.tolist()
+
+
+class _PlainUnpickler(pickle.Unpickler):
+    # Los formatos antiguos solo tienen dict/list/tuple/str/int/float: se
+    # rechaza cualquier clase o función para no ejecutar código del archivo
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError(f"{module}.{name} no permitido en un índice ISAM")
+
+
+def _legacy_loads(data):
+    # Solo para migrar archivos ISM1 y del formato con pickle completo
+    return _PlainUnpickler(io.BytesIO(data)).load()
+
+
+def _unpack_v1_column(code, data):
+    # ISM1 guardaba con pickle las columnas que no eran numéricas
+    return _legacy_loads(data) if code == b'p' else _unpack_column(code, data)
+
+
 class ISAMIndex:
     def __init__(self, data_filename: str, index_filename: str = None, file_manager=None, persist_path: str = None):
         # metadatos
         self.data_filename = data_filename
-        self.index_filename = index_filename or (data_filename.replace('.dat', '.idx') if data_filename else None)
+        self.index_filename = index_filename or (str(Path(data_filename).with_suffix('.idx')) if data_filename else None)
         self.file_manager = file_manager
         self.persist_path = persist_path or self.index_filename
 
         # índices en memoria
         self.idx_l1 = []  # raiz (lista de (first_key, start_index_in_l2) )
         self.idx_l2 = []  # medio (lista de (first_key, start_index_in_l3) )
-        self.idx_l3 = []  # hojas (lista ordenada de (key, pos))
+        # hojas en dos listas paralelas (SoA): keys ordenadas y la pos de cada
+        # una. Las búsquedas comparan llaves sin indexar una tupla por paso
+        self.keys = []
+        self.positions = []
 
-        self.overflow = {}
+        # overflow como una página secundaria ordenada: dos listas paralelas
+        # (llave, pos) ordenadas por llave; las pos de una misma llave quedan
+        # en orden de llegada (la primera es la que se promueve al borrar)
+        self.overflow_keys = []
+        self.overflow_pos = []
+        # índice de hoja de la última búsqueda: consultas casi monótonas
+        # (joins sobre entradas ordenadas, rangos repetidos) caen ahí o al lado
+        self._last_i = 0
 
         self.order = IDX_BLOCK_FACTOR
 
+    @property
+    def idx_l3(self):
+        # Vista (key, pos) de las hojas, para depuración y compatibilidad
+        return list(zip(self.keys, self.positions))
+
+    @idx_l3.setter
+    def idx_l3(self, pairs):
+        self.keys = list(map(itemgetter(0), pairs))
+        self.positions = list(map(itemgetter(1), pairs))
+
     @staticmethod
     def insert_pos(lista, key):
-        # Busca donde insertar por clave
-        lo = 0
-        hi = len(lista)
-        while lo < hi:
-            mid = (lo + hi) // 2
-            if lista[mid][0] < key:
-                lo = mid + 1
-            else:
-                hi = mid
-        return lo
+        # Busca donde insertar por clave (lista de llaves ordenada); bisect en C
+        return bisect_left(lista, key)
 
     @staticmethod
     def busqueda_binaria(lista, target):
-        # Busca índice del mayor
-        lo = 0
-        hi = len(lista) - 1
-        result = -1
-        while lo <= hi:
-            mid = (lo + hi) // 2
-            if lista[mid][0] <= target:
-                result = mid
-                lo = mid + 1
-            else:
-                hi = mid - 1
-        return result
+        # Busca índice del mayor <= target (lista de llaves ordenada), o -1
+        return bisect_right(lista, target) - 1
 
     def recontruir2y1(self):
         # Reconstruye idx_l2 e idx_l1 desde idx_l3 (paginación lógica)
         self.idx_l2 = []
         self.idx_l1 = []
-        if not self.idx_l3:
+        self._rebuild_from(0)
+
+    def _rebuild_from(self, index):
+        # Tras insertar/borrar en la hoja `index` solo cambian las páginas de L2
+        # desde la que la contiene (sus first_key se corren) y los bloques de L1
+        # que las resumen; el prefijo se conserva.
+        # L2: cada IDX_BLOCK_FACTOR entradas de las hojas forman una 'página'
+        # resumen; L1: cada IDX_BLOCK_FACTOR páginas de L2 forman un bloque.
+        # Las first_key salen de un slice con paso (sin un bucle por página)
+        factor = IDX_BLOCK_FACTOR
+        page = index // factor
+        del self.idx_l2[page:]
+        self.idx_l2 += zip(self.keys[page * factor::factor], range(page * factor, len(self.keys), factor))
+        block = page // factor
+        del self.idx_l1[block:]
+        self.idx_l1 += zip([key for key, _ in self.idx_l2[block * factor::factor]],
+                           range(block * factor, len(self.idx_l2), factor))
+        # toda mutación de las hojas pasa por aquí: invalida la pista de búsqueda
+        self._last_i = 0
+
+    def _locate(self, key):
+        # Igual que insert_pos(self.keys, key), pero antes prueba la última
+        # posición encontrada y su vecina derecha; solo si fallan hace bisect
+        keys = self.keys
+        i = self._last_i
+        if i < len(keys) and keys[i] >= key and (i == 0 or keys[i - 1] < key):
+            return i
+        i += 1
+        if i < len(keys) and keys[i] >= key and keys[i - 1] < key:
+            self._last_i = i
+            return i
+        i = self._last_i = bisect_left(keys, key)
+        return i
+
+    def _add_overflow(self, key, pos, base_pos):
+        # Agrega pos al tramo de `key` en overflow (al final), evitando duplicar
+        # la base o una pos ya encadenada
+        if pos == base_pos:
+            return
+        lo = bisect_left(self.overflow_keys, key)
+        hi = bisect_right(self.overflow_keys, key, lo)
+        if pos in self.overflow_pos[lo:hi]:
             return
-        # L2: cada IDX_BLOCK_FACTOR entradas de idx_l3 forman una 'página' resumen
-        for page_start in range(0, len(self.idx_l3), IDX_BLOCK_FACTOR):
-            first_key = self.idx_l3[page_start][0]
-            self.idx_l2.append((first_key, page_start))
-        # L1: cada IDX_BLOCK_FACTOR páginas de idx_l2 forman un bloque de resumen
-        for block_start in range(0, len(self.idx_l2), IDX_BLOCK_FACTOR):
-            first_key = self.idx_l2[block_start][0]
-            self.idx_l1.append((first_key, block_start))
+        self.overflow_keys.insert(hi, key)
+        self.overflow_pos.insert(hi, pos)
+
+    def _pop_overflow(self, key):
+        # Saca la primera pos encadenada de `key`, o None si no tiene overflow
+        i = bisect_left(self.overflow_keys, key)
+        if i < len(self.overflow_keys) and self.overflow_keys[i] == key:
+            del self.overflow_keys[i]
+            return self.overflow_pos.pop(i)
+        return None
+
+    def _set_overflow(self, overflow):
+        # Convierte el overflow en formato dict {key: [pos, ...]} (archivos
+        # anteriores) a las listas paralelas
+        self.overflow_keys = []
+        self.overflow_pos = []
+        for key in sorted(overflow):
+            self.overflow_keys.extend([key] * len(overflow[key]))
+            self.overflow_pos.extend(overflow[key])
 
     def is_empty(self):
-        return len(self.idx_l3) == 0
+        return len(self.keys) == 0
 
     def insert(self, key, pos):
         """
         Inserta (key,pos). Comportamiento mínimo ISAM con overflow:
         - Si la clave no existe -> se inserta en idx_l3 (base).
-        - Si la clave ya existe en base -> pos se añade a self.overflow[key].
+        - Si la clave ya existe en base -> pos se añade a su tramo en overflow.
         (Así mantenemos una posición 'base' en idx_l3 y overflow encadenado).
         """
-        if not self.idx_l3:
+        keys = self.keys
+        if not keys:
             # lista vacía
-            self.idx_l3.insert(0, (key, pos))
-            self.recontruir2y1()
+            keys.insert(0, key)
+            self.positions.insert(0, pos)
+            self._rebuild_from(0)
             return
 
-        i = self.insert_pos(self.idx_l3, key)
+        i = self.insert_pos(keys, key)
         # caso exacto de match en la posición i
-        if i < len(self.idx_l3) and self.idx_l3[i][0] == key:
-            base_pos = self.idx_l3[i][1]
-            # overflow
-            self.overflow.setdefault(key, [])
-            # evitar duplicados exactos de pos
-            if pos != base_pos and pos not in self.overflow[key]:
-                self.overflow[key].append(pos)
+        if i < len(keys) and keys[i] == key:
+            # overflow (evitando duplicados exactos de pos)
+            self._add_overflow(key, pos, self.positions[i])
             return
         # si el anterior elemento es el match
-        if i > 0 and self.idx_l3[i - 1][0] == key:
-            base_pos = self.idx_l3[i - 1][1]
-            self.overflow.setdefault(key, [])
-            if pos != base_pos and pos not in self.overflow[key]:
-                self.overflow[key].append(pos)
+        if i > 0 and keys[i - 1] == key:
+            self._add_overflow(key, pos, self.positions[i - 1])
             return
 
-        self.idx_l3.insert(i, (key, pos))
-
-        if key in self.overflow and not self.overflow[key]:
-            self.overflow.pop(key, None)
-        self.recontruir2y1()
+        keys.insert(i, key)
+        self.positions.insert(i, pos)
+        self._rebuild_from(i)
 
     def bulk_insert(self, pairs):
         #Carga masiva: reemplaza idx_l3 con lista ordenada de (key,pos) y limpia overflow.
-        self.idx_l3 = sorted(pairs, key=lambda x: x[0])
-        self.overflow = {}
+        # Orden estable por llave con itemgetter (en C) y luego las dos
+        # columnas en una pasada; las páginas L2/L1 salen de slices con paso
+        pairs = sorted(pairs, key=itemgetter(0))
+        self.keys = list(map(itemgetter(0), pairs))
+        self.positions = list(map(itemgetter(1), pairs))
+        self.overflow_keys = []
+        self.overflow_pos = []
         self.recontruir2y1()
 
     def search(self, key):
@@ -119,13 +229,14 @@ class ISAMIndex:
         Retorna la posición 'base' asociada a key o None.
         (Para acceder a todas las posiciones usar get_all_positions)
         """
-        if not self.idx_l3:
+        keys = self.keys
+        if not keys:
             return None
-        i = self.insert_pos(self.idx_l3, key)
-        if i < len(self.idx_l3) and self.idx_l3[i][0] == key:
-            return self.idx_l3[i][1]
-        if i > 0 and self.idx_l3[i - 1][0] == key:
-            return self.idx_l3[i - 1][1]
+        i = self._locate(key)
+        if i < len(keys) and keys[i] == key:
+            return self.positions[i]
+        if i > 0 and keys[i - 1] == key:
+            return self.positions[i - 1]
         return None
 
     def get_all_positions(self, key):
@@ -133,11 +244,9 @@ class ISAMIndex:
         base = self.search(key)
         if base is None:
             return []
-        res = [base]
-        extra = self.overflow.get(key, [])
-        if extra:
-            res.extend(extra)
-        return res
+        lo = bisect_left(self.overflow_keys, key)
+        hi = bisect_right(self.overflow_keys, key, lo)
+        return [base] + self.overflow_pos[lo:hi]
 
     def delete(self, key):
         """
@@ -146,56 +255,68 @@ class ISAMIndex:
         - Si no hay overflow, borra la entrada base.
         Retorna True si se eliminó (o promovió) algo.
         """
-        if not self.idx_l3:
+        keys = self.keys
+        if not keys:
             return False
-        i = self.insert_pos(self.idx_l3, key)
+        i = self.insert_pos(keys, key)
         # match en i
-        if i < len(self.idx_l3) and self.idx_l3[i][0] == key:
-            # existe base
-            if self.overflow.get(key):
-                # promover primer overflow como base
-                promoted = self.overflow[key].pop(0)
-                self.idx_l3[i] = (key, promoted)
-                if not self.overflow[key]:
-                    self.overflow.pop(key, None)
+        if i < len(keys) and keys[i] == key:
+            # existe base: si hay overflow, promover el primero como base
+            promoted = self._pop_overflow(key)
+            if promoted is not None:
+                self.positions[i] = promoted
                 return True
             else:
                 # eliminar base
-                self.idx_l3.pop(i)
-                self.recontruir2y1()
+                keys.pop(i)
+                self.positions.pop(i)
+                self._rebuild_from(i)
                 return True
         # buscar match en anteior
-        if i > 0 and self.idx_l3[i - 1][0] == key:
+        if i > 0 and keys[i - 1] == key:
             idx = i - 1
-            if self.overflow.get(key):
-                promoted = self.overflow[key].pop(0)
-                self.idx_l3[idx] = (key, promoted)
-                if not self.overflow[key]:
-                    self.overflow.pop(key, None)
+            promoted = self._pop_overflow(key)
+            if promoted is not None:
+                self.positions[idx] = promoted
                 return True
             else:
-                self.idx_l3.pop(idx)
-                self.recontruir2y1()
+                keys.pop(idx)
+                self.positions.pop(idx)
+                self._rebuild_from(idx)
                 return True
         return False
 
     def range_search(self, start_key, end_key):
         results = []
-        if not self.idx_l3:
+        keys = self.keys
+        if not keys:
             return results
-        # localizar inicio
-        i = self.insert_pos(self.idx_l3, start_key)
-        if i > 0 and self.idx_l3[i - 1][0] >= start_key:
+        # localizar inicio y fin; el tramo [i, j) se toma con un slice
+        i = self._locate(start_key)
+        if i > 0 and keys[i - 1] >= start_key:
             i = i - 1
-        n = len(self.idx_l3)
-        j = i
-        while j < n and self.idx_l3[j][0] <= end_key:
-            key, base_pos = self.idx_l3[j]
-            results.append((key, base_pos))
-            extras = self.overflow.get(key, [])
-            for p in extras:
-                results.append((key, p))
-            j += 1
+        j = self.busqueda_binaria(keys, end_key) + 1
+        positions = self.positions
+        okeys = self.overflow_keys
+        o = bisect_left(okeys, start_key)
+        o_end = bisect_right(okeys, end_key, o)
+        # un solo barrido: se copian las hojas por tramos y tras cada llave
+        # con overflow se intercalan sus pos encadenadas
+        while o < o_end:
+            key = okeys[o]
+            o_next = bisect_right(okeys, key, o, o_end)
+            b0 = bisect_left(keys, key, i, j)
+            b1 = bisect_right(keys, key, b0, j)
+            results += zip(keys[i:b0], positions[i:b0])
+            # (las llaves repetidas de una carga masiva llevan cada una el tramo)
+            extras = [(key, p) for p in self.overflow_pos[o:o_next]]
+            for base_pos in positions[b0:b1]:
+                results.append((key, base_pos))
+                results += extras
+            i = b1
+            o = o_next
+        # resto del tramo sin overflow (zip en C)
+        results += zip(keys[i:j], positions[i:j])
         return results
 
     def update(self, key, pos):
@@ -204,37 +325,45 @@ class ISAMIndex:
         - Si está en overflow pero no en base, la dejamos (no promovemos).
         - Si no está, se inserta.
         """
-        if not self.idx_l3:
-            self.idx_l3.append((key, pos))
-            self.recontruir2y1()
+        keys = self.keys
+        if not keys:
+            keys.append(key)
+            self.positions.append(pos)
+            self._rebuild_from(0)
             return True
-        i = self.insert_pos(self.idx_l3, key)
-        if i < len(self.idx_l3) and self.idx_l3[i][0] == key:
-            self.idx_l3[i] = (key, pos)
+        i = self.insert_pos(keys, key)
+        if i < len(keys) and keys[i] == key:
+            self.positions[i] = pos
             return True
-        if i > 0 and self.idx_l3[i - 1][0] == key:
-            self.idx_l3[i - 1] = (key, pos)
+        if i > 0 and keys[i - 1] == key:
+            self.positions[i - 1] = pos
             return True
         # si no se encuentra, insertar como nueva base
-        self.idx_l3.insert(i, (key, pos))
-        self.recontruir2y1()
+        keys.insert(i, key)
+        self.positions.insert(i, pos)
+        self._rebuild_from(i)
         return True
 
     # PERSISTENCIA ---------------------------------------------
+    # Cabecera + columnas de las hojas volcadas tal cual (arrays binarios);
+    # L1/L2 no se guardan: se derivan de las hojas con recontruir2y1
+    MAGIC = b'ISM2'
+    HEADER = struct.Struct('=4si4sqqqq')  # magic, order, códigos y bytes de cada columna
+    # ISM1: solo las hojas como columnas, overflow como dict con pickle
+    MAGIC_V1 = b'ISM1'
+    HEADER_V1 = struct.Struct('=4si2sqqq')
+
     def save_to_file(self, path: str = None) -> bool:
         path = path or self.persist_path
         if not path:
             return False
-        state = {
-            'idx_l3': self.idx_l3,
-            'idx_l2': self.idx_l2,
-            'idx_l1': self.idx_l1,
-            'overflow': self.overflow,
-            'order': self.order
-        }
         try:
+            # hojas y overflow: cuatro columnas (llaves, pos, llaves ovf, pos ovf)
+            codes, columns = zip(*map(_pack_column, (self.keys, self.positions,
+                                                     self.overflow_keys, self.overflow_pos)))
+            header = self.HEADER.pack(self.MAGIC, self.order, b''.join(codes), *map(len, columns))
             with open(path, 'wb') as f:
-                pickle.dump(state, f)
+                f.write(header + b''.join(columns))
             return True
         except Exception as e:
             print(f"[ISAM] Error guardando índice en '{path}': {e}")
@@ -248,24 +377,56 @@ class ISAMIndex:
             return False
         try:
             with open(path, 'rb') as f:
-                state = pickle.load(f)
-            self.idx_l3 = state.get('idx_l3', [])
-            self.idx_l2 = state.get('idx_l2', [])
-            self.idx_l1 = state.get('idx_l1', [])
-            self.overflow = state.get('overflow', {})
-            self.order = state.get('order', self.order)
-            # si idx_l2/l1 están vacíos, reconstruir
-            if not self.idx_l2 or not self.idx_l1:
-                self.recontruir2y1()
+                data = f.read()
+            if data[:4] == self.MAGIC_V1:
+                return self._load_v1(data)
+            if data[:4] != self.MAGIC:
+                # formato original: el estado completo con pickle (protocolo >= 2)
+                if data[:1] != b'\x80':
+                    raise ValueError("formato no reconocido")
+                return self._load_pickle_state(_legacy_loads(data))
+            magic, order, codes, *sizes = self.HEADER.unpack_from(data)
+            offset = self.HEADER.size
+            columns = []
+            for n, size in enumerate(sizes):
+                columns.append(_unpack_column(codes[n:n + 1], data[offset:offset + size]))
+                offset += size
+            self.keys, self.positions, self.overflow_keys, self.overflow_pos = columns
+            self.order = order
+            self.recontruir2y1()
             return True
         except Exception as e:
             print(f"[ISAM] Error cargando índice desde '{path}': {e}")
             return False
+
+    def _load_v1(self, data) -> bool:
+        magic, order, codes, key_size, pos_size, overflow_size = self.HEADER_V1.unpack_from(data)
+        offset = self.HEADER_V1.size
+        self.keys = _unpack_v1_column(codes[:1], data[offset:offset + key_size])
+        offset += key_size
+        self.positions = _unpack_v1_column(codes[1:], data[offset:offset + pos_size])
+        offset += pos_size
+        self._set_overflow(_legacy_loads(data[offset:offset + overflow_size]))
+        self.order = order
+        self.recontruir2y1()
+        return True
+
+    def _load_pickle_state(self, state) -> bool:
+        # Formato anterior: dict con las listas de tuplas de cada nivel
+        self.idx_l3 = state.get('idx_l3', [])
+        self.idx_l2 = state.get('idx_l2', [])
+        self.idx_l1 = state.get('idx_l1', [])
+        self._set_overflow(state.get('overflow', {}))
+        self.order = state.get('order', self.order)
+        # si idx_l2/l1 están vacíos, reconstruir
+        if not self.idx_l2 or not self.idx_l1:
+            self.recontruir2y1()
+        return True
     
     def debug_print(self, max_show=10):
-        print("ISAMIndex: entries:", len(self.idx_l3))
+        print("ISAMIndex: entries:", len(self.keys))
         print("L1:", self.idx_l1[:max_show])
         print("L2:", self.idx_l2[:max_show])
-        print("L3 (primeras):", self.idx_l3[:max_show])
-        print("Overflow (primeras keys):", list(self.overflow.items())[:max_show])
-        print("L3 (primeras):", self.idx_l3[:max_show])
+        print("L3 (primeras):", list(zip(self.keys[:max_show], self.positions[:max_show])))
+        print("Overflow (primeras):", list(zip(self.overflow_keys[:max_show], self.overflow_pos[:max_show])))
+        print("L3 (primeras):", list(zip(self.keys[:max_show], self.positions[:max_show])))
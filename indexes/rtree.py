@@ -1,6 +1,10 @@
+import heapq
+import math
+import os
 import struct
+from array import array
 
-M = 4 # DEFAULT MAX CHILDREN PER NODE
+M = 16 # DEFAULT MAX CHILDREN PER NODE
 m = M // 2 # MINIMUM CHILDREN PER NODE
 
 # record: id, x, y
@@ -9,9 +13,11 @@ class RTreeNode:
     def __init__(self, node_id, is_leaf=False):
         self.is_leaf = is_leaf # True if leaf node, False if internal node
         self.node_id = node_id # Unique identifier for the node
+        self.parent = None # Parent node (None for the root), kept up to date on insert/split
         self.size = 0  # Current number of children
         self.children = [] # List of child nodes pointers (Rectangles (minx,miny,maxx,maxy)) or entries (Point data (x,x,y,y)) 
         self.bbox = (float('inf'), float('inf'), float('-inf'), float('-inf'))  # (minx, miny, maxx, maxy)
+        self._area = float('inf')  # Area of bbox, kept in sync by set_bbox()
 
     def is_leaf_node(self):
         """Check if the node is a leaf node."""
@@ -27,51 +33,37 @@ class RTreeNode:
 
     def mindist_to_point(self, point):
         """Calculate the minimum distance from the bounding box to a point."""
-        px, py = point
-        minx, miny, maxx, maxy = self.bbox
-        if px < minx:
-            dx = minx - px
-        elif px > maxx:
-            dx = px - maxx
-        else:
-            dx = 0
-        if py < miny:
-            dy = miny - py
-        elif py > maxy:
-            dy = py - maxy
-        else:
-            dy = 0
-        return (dx * dx + dy * dy) ** 0.5 # Euclidean distance to the nearest edge or corner
+        return self.mindist2_to_point(point) ** 0.5 # Euclidean distance to the nearest edge or corner
+
+    def mindist2_to_point(self, point):
+        """Squared minimum distance from the bounding box to a point (no sqrt)."""
+        bbox = self.bbox
+        return _mindist2(bbox[0], bbox[1], bbox[2], bbox[3], point[0], point[1])
+
+    def set_bbox(self, bbox):
+        """Replace the bounding box and refresh the cached area."""
+        self.bbox = bbox
+        self._area = (bbox[2] - bbox[0]) * (bbox[3] - bbox[1])
 
     def update_bbox(self):
-        """Update the bounding box to enclose all children."""
-        if self.is_leaf:
-            if not self.children:
-                self.bbox = (float('inf'), float('inf'), float('-inf'), float('-inf'))
-                return
-            minx = min(child[0] for child in self.children)
-            miny = min(child[1] for child in self.children)
-            maxx = max(child[2] for child in self.children)
-            maxy = max(child[3] for child in self.children)
-            self.bbox = (minx, miny, maxx, maxy)
-        else:
-            # Primero actualizar bbox de todos los hijos
-            for child in self.children:
-                child.update_bbox()
-            if not self.children:
-                self.bbox = (float('inf'), float('inf'), float('-inf'), float('-inf'))
-                return
-            # Luego calcular bbox que englobe todos los hijos
-            minx = min(child.bbox[0] for child in self.children)
-            miny = min(child.bbox[1] for child in self.children)
-            maxx = max(child.bbox[2] for child in self.children)
-            maxy = max(child.bbox[3] for child in self.children)
-            self.bbox = (minx, miny, maxx, maxy)
-        
+        """Update the bounding box to enclose all children.
+
+        Only this node is recomputed: the children's bboxes are assumed to be
+        current, as every caller works bottom-up (splits, deletes, bulk_load)
+        or grows the ancestor chain itself (insert_by_rect).
+        """
+        if not self.children:
+            self.set_bbox((float('inf'), float('inf'), float('-inf'), float('-inf')))
+            return
+        # Transponer las cajas en columnas (minx, miny, maxx, maxy[, payload]) y
+        # reducir cada columna con min/max en C, en vez de un generador por coordenada
+        boxes = self.children if self.is_leaf else [child.bbox for child in self.children]
+        cols = tuple(zip(*boxes))
+        self.set_bbox((min(cols[0]), min(cols[1]), max(cols[2]), max(cols[3])))
+
     def area(self):
         """Calculate the area of the bounding box."""
-        minx, miny, maxx, maxy = self.bbox
-        return (maxx - minx) * (maxy - miny)
+        return self._area
     
     def enlarged_area(self, rect):
         """Calculate the area increase if this node's bbox were to include rect."""
@@ -81,16 +73,466 @@ class RTreeNode:
         new_miny = min(miny, rminy)
         new_maxx = max(maxx, rmaxx)
         new_maxy = max(maxy, rmaxy)
-        return (new_maxx - new_minx) * (new_maxy - new_miny) - self.area()
+        return (new_maxx - new_minx) * (new_maxy - new_miny) - self._area
     
+def _mindist2(minx, miny, maxx, maxy, px, py):
+    """Squared distance from (px, py) to the rectangle (0 if inside).
+
+    Branchy on purpose: in CPython an if/elif chain is ~4x cheaper than the
+    branchless max(0.0, minx - px, px - maxx), which pays for a builtin call.
+    """
+    if px < minx:
+        dx = minx - px
+    elif px > maxx:
+        dx = px - maxx
+    else:
+        dx = 0.0
+    if py < miny:
+        dy = miny - py
+    elif py > maxy:
+        dy = py - maxy
+    else:
+        dy = 0.0
+    return dx * dx + dy * dy
+
+
+def _overlapping_children(node, query):
+    """Children of an internal node whose bbox intersects `query`.
+
+    The query bounds are unpacked once and every child box is tested in a
+    single comprehension, instead of indexing `child.bbox[i]` four times per
+    child inside a Python loop. Child boxes stay as tuples: a per-node
+    array('d') buffer is ~1.7x slower to scan in CPython, since every element
+    read allocates a new float (the packed layout pays that only once per run).
+    """
+    qminx, qminy, qmaxx, qmaxy = query[0], query[1], query[2], query[3]
+    return [child for child in node.children
+            for minx, miny, maxx, maxy in (child.bbox,)
+            if maxx >= qminx and minx <= qmaxx and maxy >= qminy and miny <= qmaxy]
+
+
+def _str_groups(items, center_x, center_y, capacity):
+    """Sort-Tile-Recursive grouping of `items` into nodes of at most `capacity`.
+
+    Items are sorted by x, cut into ~sqrt(P) vertical slices (P = number of
+    nodes), each slice is sorted by y and then cut into consecutive groups.
+    Group sizes differ by at most one, so every node is close to full.
+    """
+    n = len(items)
+    groups = -(-n // capacity)
+    slices = math.ceil(math.sqrt(groups))
+    per_slice = capacity * -(-groups // slices)
+    items = sorted(items, key=center_x)
+    ordered = []
+    for start in range(0, n, per_slice):
+        ordered.extend(sorted(items[start:start + per_slice], key=center_y))
+    return [ordered[i * n // groups:(i + 1) * n // groups] for i in range(groups)]
+
+
+def _rrstar_penalty(bbox, area, rect):
+    """Lexicographic insertion penalty of putting `rect` under `bbox` (RR*-tree).
+
+    Tiers, best first:
+      0. bbox already contains rect and has zero area -> smallest margin
+      1. bbox already contains rect                    -> smallest area
+      2. covering rect does not grow the area          -> smallest margin increase
+      3. otherwise                                     -> smallest area increase
+
+    `area` is the (cached) area of `bbox`.
+    """
+    minx, miny, maxx, maxy = bbox
+    rminx, rminy, rmaxx, rmaxy = rect
+    if minx <= rminx and miny <= rminy and maxx >= rmaxx and maxy >= rmaxy:
+        if area == 0:
+            return (0, (maxx - minx) + (maxy - miny), 0.0)
+        return (1, area, 0.0)
+    nw = max(maxx, rmaxx) - min(minx, rminx)
+    nh = max(maxy, rmaxy) - min(miny, rminy)
+    enlargement = nw * nh - area
+    margin_increase = (nw + nh) - ((maxx - minx) + (maxy - miny))
+    if enlargement == 0:
+        return (2, margin_increase, 0.0)
+    return (3, enlargement, margin_increase)
+
+
+def _entry_bbox(entry):
+    """Bounding box of a node child: a leaf entry tuple or an RTreeNode."""
+    if isinstance(entry, RTreeNode):
+        return entry.bbox
+    return (entry[0], entry[1], entry[2], entry[3])
+
+
+def _quadratic_partition(entries, min_fill):
+    """Guttman's quadratic split of `entries` into two groups.
+
+    The seeds are the pair wasting the most dead space when covered by one
+    box. Every other entry goes to the group whose bbox grows least (ties:
+    smaller area, then fewer entries). Once a group needs all the remaining
+    entries to reach `min_fill`, they are all given to it.
+    """
+    boxes = [_entry_bbox(e) for e in entries]
+    areas = [(b[2] - b[0]) * (b[3] - b[1]) for b in boxes]
+    n = len(entries)
+
+    seed1, seed2, worst = 0, 1, float('-inf')
+    for i in range(n):
+        aminx, aminy, amaxx, amaxy = boxes[i]
+        for j in range(i + 1, n):
+            bminx, bminy, bmaxx, bmaxy = boxes[j]
+            dead = ((max(amaxx, bmaxx) - min(aminx, bminx)) * (max(amaxy, bmaxy) - min(aminy, bminy))
+                    - areas[i] - areas[j])
+            if dead > worst:
+                seed1, seed2, worst = i, j, dead
+
+    groups = ([entries[seed1]], [entries[seed2]])
+    covers = [list(boxes[seed1]), list(boxes[seed2])]
+    rest = [i for i in range(n) if i != seed1 and i != seed2]
+    for pos, i in enumerate(rest):
+        remaining = len(rest) - pos
+        if len(groups[0]) + remaining <= min_fill:
+            target = 0
+        elif len(groups[1]) + remaining <= min_fill:
+            target = 1
+        else:
+            minx, miny, maxx, maxy = boxes[i]
+            scores = []
+            for g in (0, 1):
+                cminx, cminy, cmaxx, cmaxy = covers[g]
+                area = (cmaxx - cminx) * (cmaxy - cminy)
+                grown = (max(cmaxx, maxx) - min(cminx, minx)) * (max(cmaxy, maxy) - min(cminy, miny))
+                scores.append((grown - area, area, len(groups[g])))
+            target = 0 if scores[0] <= scores[1] else 1
+        groups[target].append(entries[i])
+        cover = covers[target]
+        minx, miny, maxx, maxy = boxes[i]
+        if minx < cover[0]: cover[0] = minx
+        if miny < cover[1]: cover[1] = miny
+        if maxx > cover[2]: cover[2] = maxx
+        if maxy > cover[3]: cover[3] = maxy
+    return groups
+
+
+def _pack_values(values):
+    """Encode ids/payloads as (code, bytes) like the other buffers, no pickle.
+
+    'q' int64 array, 'd' float64 array, or 's': an int64 array of UTF-8 byte
+    lengths followed by the encoded strings. Mixed or other types raise
+    TypeError (save_to_file then reports the save as failed).
+    """
+    if all(type(v) is int and -2 ** 63 <= v < 2 ** 63 for v in values):
+        return b'q', array('q', values).tobytes()
+    if all(type(v) is float for v in values):
+        return b'd', array('d', values).tobytes()
+    if all(type(v) is str for v in values):
+        encoded = [v.encode('utf-8') for v in values]
+        return b's', b''.join((array('q', map(len, encoded)).tobytes(), *encoded))
+    raise TypeError("R-tree ids must be all int, all float or all str")
+
+
+def _unpack_values(code, data, n):
+    """Inverse of _pack_values for `n` values."""
+    if code == b's':
+        lengths = array('q')
+        lengths.frombytes(data[:8 * n])
+        offset = 8 * n
+        values = []
+        for length in lengths:
+            values.append(data[offset:offset + length].decode('utf-8'))
+            offset += length
+        return values
+    if code not in (b'q', b'd'):
+        raise ValueError(f"unknown value code {code!r}")
+    column = array(code.decode())
+    column.frombytes(data[:8 * n])
+    return column.tolist()
+
+
+_F32 = struct.Struct('<f')
+_I32 = struct.Struct('<i')
+
+
+def _f32_step(value, down):
+    """Next float32 after `value` (already a float32) towards -inf or +inf."""
+    if value == 0.0:
+        tiny = _F32.unpack(_I32.pack(1))[0]
+        return -tiny if down else tiny
+    bits = _I32.unpack(_F32.pack(value))[0]
+    bits += -1 if (value > 0) == down else 1
+    return _F32.unpack(_I32.pack(bits))[0]
+
+
+def _f32_outward(bbox):
+    """Round an MBR to float32 so that the result still contains it."""
+    minx, miny, maxx, maxy = (_F32.unpack(_F32.pack(v))[0] for v in bbox)
+    if minx > bbox[0]:
+        minx = _f32_step(minx, True)
+    if miny > bbox[1]:
+        miny = _f32_step(miny, True)
+    if maxx < bbox[2]:
+        maxx = _f32_step(maxx, False)
+    if maxy < bbox[3]:
+        maxy = _f32_step(maxy, False)
+    return minx, miny, maxx, maxy
+
+
+def _box_rows(buf, lo, hi):
+    """(i, minx, miny, maxx, maxy) for boxes lo..hi-1 of a flat 4-per-box buffer.
+
+    Slicing the run once and unpacking it four values at a time is cheaper
+    than four index computations and lookups per box.
+    """
+    it = iter(buf[4 * lo:4 * hi])
+    return zip(range(lo, hi), it, it, it, it)
+
+
+class _PackedRTree:
+    """Flat, read-only layout of an R-tree (Flatbush style).
+
+    Nodes are numbered in BFS order (root = 0), so the children of every
+    internal node are a contiguous range of node numbers, and the entries of
+    every leaf are a contiguous range of item numbers. All MBRs live in two
+    flat array('d') buffers (4 doubles per box) instead of one RTreeNode
+    object plus a bbox tuple per node.
+
+    Node MBRs are stored as float32, rounded outwards, which halves the bytes
+    read per child test; a slightly larger node box can only cause an extra
+    descent, never a missed result. Entry MBRs stay float64 so the answers are
+    exact.
+    """
+
+    def __init__(self, root):
+        self.node_boxes = array('f')  # 4 float32 per node
+        self.first = array('q')       # first child node / first item of each node
+        self.end = array('q')         # one past the last child node / item
+        self.leaf = bytearray()       # 1 if the node is a leaf
+        self.item_boxes = array('d')  # 4 doubles per leaf entry
+        self.payloads = []            # payload of each leaf entry
+        nodes = [root]
+        i = 0
+        while i < len(nodes):
+            node = nodes[i]
+            i += 1
+            self.node_boxes.extend(_f32_outward(node.bbox))
+            if node.is_leaf:
+                self.leaf.append(1)
+                self.first.append(len(self.payloads))
+                for entry in node.children:
+                    self.item_boxes.extend(entry[:4])
+                    self.payloads.append(entry[4])
+                self.end.append(len(self.payloads))
+            else:
+                self.leaf.append(0)
+                self.first.append(len(nodes))
+                nodes.extend(node.children)
+                self.end.append(len(nodes))
+        # Rango de entradas bajo cada subárbol: todas las hojas están a la misma
+        # profundidad, así que las de un subárbol son consecutivas en orden BFS
+        self.item_lo = array('q', self.first)
+        self.item_hi = array('q', self.end)
+        for i in range(len(nodes) - 1, -1, -1):
+            if not self.leaf[i]:
+                self.item_lo[i] = self.item_lo[self.first[i]]
+                self.item_hi[i] = self.item_hi[self.end[i] - 1]
+
+    # Serialización: cabecera + cada buffer volcado tal cual (tobytes/frombytes),
+    # sin recorrer nodos ni reinsertar entradas al cargar
+    HEADER = struct.Struct('=4sii1s')  # magic, n_nodes, n_items, payload code
+    MAGIC = b'RTP2'
+    _ARRAYS = ('node_boxes', 'first', 'end', 'item_lo', 'item_hi', 'item_boxes')
+
+    def to_bytes(self):
+        code, payloads = _pack_values(self.payloads)
+        parts = [self.HEADER.pack(self.MAGIC, len(self.leaf), len(self.payloads), code),
+                 bytes(self.leaf)]
+        parts += [getattr(self, name).tobytes() for name in self._ARRAYS]
+        parts.append(payloads)
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, n_nodes, n_items, code = cls.HEADER.unpack_from(data, 0)
+        if magic != cls.MAGIC:
+            raise ValueError("not a packed R-tree")
+        packed = cls.__new__(cls)
+        offset = cls.HEADER.size
+        packed.leaf = bytearray(data[offset:offset + n_nodes])
+        offset += n_nodes
+        for name, array_code, count in zip(cls._ARRAYS, 'fqqqqd', (4 * n_nodes,) + (n_nodes,) * 4 + (4 * n_items,)):
+            buf = array(array_code)
+            size = count * buf.itemsize
+            buf.frombytes(data[offset:offset + size])
+            offset += size
+            setattr(packed, name, buf)
+        packed.payloads = _unpack_values(code, data[offset:], n_items)
+        return packed
+
+    def to_nodes(self, tree):
+        """Rebuild the RTreeNode objects (with parents) and return the root."""
+        boxes, items, payloads = self.node_boxes, self.item_boxes, self.payloads
+        nodes = []
+        for i in range(len(self.leaf)):
+            node = RTreeNode(i, is_leaf=bool(self.leaf[i]))
+            node.set_bbox(tuple(boxes[4 * i:4 * i + 4]))
+            nodes.append(node)
+        for i, node in enumerate(nodes):
+            if node.is_leaf:
+                node.children = [tuple(items[4 * j:4 * j + 4]) + (payloads[j],)
+                                 for j in range(self.first[i], self.end[i])]
+            else:
+                node.children = nodes[self.first[i]:self.end[i]]
+                for child in node.children:
+                    child.parent = node
+            node.size = len(node.children)
+        tree.node_count = len(nodes)
+        return nodes[0]
+
+    def intersect(self, query):
+        """Payloads whose MBR intersects `query`, in left-to-right DFS order."""
+        q0, q1, q2, q3 = query[0], query[1], query[2], query[3]
+        boxes, items, payloads = self.node_boxes, self.item_boxes, self.payloads
+        first, end, leaf = self.first, self.end, self.leaf
+        item_lo, item_hi = self.item_lo, self.item_hi
+        results = []
+        if not payloads:
+            return results
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            b = 4 * i
+            if boxes[b] >= q0 and boxes[b + 1] >= q1 and boxes[b + 2] <= q2 and boxes[b + 3] <= q3:
+                # Nodo contenido en la consulta: todo el subárbol es resultado
+                results += payloads[item_lo[i]:item_hi[i]]
+            elif leaf[i]:
+                # Filtro sobre las cajas contiguas de la hoja y luego recogida
+                # de los payloads por índice
+                results += [payloads[j] for j, minx, miny, maxx, maxy in _box_rows(items, first[i], end[i])
+                            if maxx >= q0 and minx <= q2 and maxy >= q1 and miny <= q3]
+            else:
+                hits = [j for j, minx, miny, maxx, maxy in _box_rows(boxes, first[i], end[i])
+                        if maxx >= q0 and minx <= q2 and maxy >= q1 and miny <= q3]
+                stack.extend(reversed(hits))
+        return results
+
+    def within(self, point, r2):
+        """Payloads whose MBR is within squared distance `r2` of `point`."""
+        px, py = point[0], point[1]
+        boxes, items, payloads = self.node_boxes, self.item_boxes, self.payloads
+        first, end, leaf = self.first, self.end, self.leaf
+        results = []
+        if not payloads or _mindist2(boxes[0], boxes[1], boxes[2], boxes[3], px, py) > r2:
+            return results
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            if leaf[i]:
+                results += [payloads[j] for j, minx, miny, maxx, maxy in _box_rows(items, first[i], end[i])
+                            if _mindist2(minx, miny, maxx, maxy, px, py) <= r2]
+            else:
+                hits = [j for j, minx, miny, maxx, maxy in _box_rows(boxes, first[i], end[i])
+                        if _mindist2(minx, miny, maxx, maxy, px, py) <= r2]
+                stack.extend(reversed(hits))
+        return results
+
+    def nearest(self, point, k):
+        """Best-first k nearest entries (by squared center distance)."""
+        px, py = point[0], point[1]
+        boxes, items, payloads = self.node_boxes, self.item_boxes, self.payloads
+        first, end, leaf = self.first, self.end, self.leaf
+        best = []  # max-heap of (-dist2, seq, payload)
+        frontier = [(0.0, 0, 0)]
+        seq = 1
+        while frontier:
+            dist, _, i = heapq.heappop(frontier)
+            if len(best) == k and dist > -best[0][0]:
+                break
+            if leaf[i]:
+                for j, minx, miny, maxx, maxy in _box_rows(items, first[i], end[i]):
+                    cx = (minx + maxx) / 2.0
+                    cy = (miny + maxy) / 2.0
+                    d = (cx - px) ** 2 + (cy - py) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, seq, payloads[j]))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, seq, payloads[j]))
+                    seq += 1
+            else:
+                for j, minx, miny, maxx, maxy in _box_rows(boxes, first[i], end[i]):
+                    d = _mindist2(minx, miny, maxx, maxy, px, py)
+                    if len(best) < k or d <= -best[0][0]:
+                        heapq.heappush(frontier, (d, seq, j))
+                        seq += 1
+        best.sort(key=lambda e: (-e[0], e[1]))
+        return [payload for _, _, payload in best]
+
+
 class RTree:
     def __init__(self, max_children=M):
         self.root = RTreeNode(0)
         self.root.is_leaf = True
         self.max_children = max_children
         self.node_count = 1  # To assign unique IDs to nodes
+        # When set, the tree lives only in this flat layout (see pack()); the
+        # node objects are rebuilt on the first insert/delete
+        self._packed = None
+
+    def pack(self):
+        """Freeze the tree into the flat _PackedRTree layout for querying."""
+        if self._packed is None:
+            self._packed = _PackedRTree(self.root)
+            self.root = None
+
+    def _unpack(self):
+        """Go back to RTreeNode objects before a mutation."""
+        if self._packed is not None:
+            self.root = self._packed.to_nodes(self)
+            self._packed = None
+
+    @classmethod
+    def bulk_load(cls, records, max_children=M):
+        """Build a packed tree from (id, x, y) point records in one pass.
+
+        Uses STR packing bottom-up: leaves are filled from the STR order of
+        the points, then each internal level is packed the same way from the
+        centers of the level below. No _choose_leaf descents or splits.
+        """
+        tree = cls(max_children=max_children)
+        entries = [(x, y, x, y, rec_id) for rec_id, x, y in records]
+        if not entries:
+            return tree
+
+        level = []
+        is_leaf = True
+        items = entries
+        while True:
+            if is_leaf:
+                groups = _str_groups(items, lambda e: e[0] + e[2], lambda e: e[1] + e[3], max_children)
+            else:
+                groups = _str_groups(items, lambda n: n.bbox[0] + n.bbox[2],
+                                     lambda n: n.bbox[1] + n.bbox[3], max_children)
+            level = []
+            for group in groups:
+                node = RTreeNode(tree.node_count, is_leaf=is_leaf)
+                tree.node_count += 1
+                node.children = group
+                node.size = len(group)
+                if not is_leaf:
+                    for child in group:
+                        child.parent = node
+                node.update_bbox()
+                level.append(node)
+            if len(level) == 1:
+                break
+            items = level
+            is_leaf = False
+
+        tree.root = level[0]
+        # A freshly packed tree is usually only queried: keep it flat
+        tree.pack()
+        return tree
 
     def is_empty(self):
+        if self._packed is not None:
+            return not self._packed.payloads
         return self.root.is_leaf and self.root.size == 0
 
     def insert(self, record):
@@ -113,6 +555,8 @@ class RTree:
         else:
             raise ValueError("insert expects (id,x,y) or (minx,miny,maxx,maxy,id)")
 
+        self._unpack()
+
         if self.root.is_leaf and self.root.size == 0:
             self.root.children.append((rect[0], rect[1], rect[2], rect[3], payload))
             self.root.size = 1
@@ -122,38 +566,56 @@ class RTree:
 
     def insert_by_rect(self, rect, record):
         """Insert a record into the R-Tree based on its bounding rectangle."""
+        self._unpack()
         leaf = self._choose_leaf(self.root, rect)
         # store as leaf entry: (minx, miny, maxx, maxy, payload)
         leaf.children.append((rect[0], rect[1], rect[2], rect[3], record))
         leaf.size += 1
         leaf.update_bbox()
+        # Grow the ancestors' bboxes so they keep enclosing the new entry
+        node = leaf.parent
+        while node is not None:
+            minx, miny, maxx, maxy = node.bbox
+            if minx <= rect[0] and miny <= rect[1] and maxx >= rect[2] and maxy >= rect[3]:
+                break
+            node.set_bbox((min(minx, rect[0]), min(miny, rect[1]), max(maxx, rect[2]), max(maxy, rect[3])))
+            node = node.parent
         if leaf.size > self.max_children:
             self._split_node(leaf)
     
     def _choose_leaf(self, node, rect):
-        """Choose the appropriate leaf node for insertion."""
-        if node.is_leaf:
-            return node
-        else:
-            rect_center = ((rect[0] + rect[2]) / 2, (rect[1] + rect[3]) / 2)
-            def score(child):
-                #child is RTreeNode
-                return (child.enlarged_area(rect), child.mindist_to_point(rect_center))
-            best_child = min(node.children, key = score) # Choose child that requires least enlargement and is closest
-            return self._choose_leaf(best_child, rect)
+        """Choose the appropriate leaf node for insertion (RR*-tree penalty)."""
+        rect = (rect[0], rect[1], rect[2], rect[3])
+        rminx, rminy, rmaxx, rmaxy = rect
+        max_children = self.max_children
+        while not node.is_leaf:
+            # Atajo: los hijos que ya contienen rect y tienen espacio ganan
+            # siempre (niveles 0/1 de la penalidad), así que solo se puntúan ellos
+            inside = [child for child in node.children
+                      for minx, miny, maxx, maxy in (child.bbox,)
+                      if minx <= rminx and miny <= rminy and maxx >= rmaxx and maxy >= rmaxy
+                      and child.size < max_children]
+            if len(inside) == 1:
+                node = inside[0]
+                continue
+            node = min(inside or node.children,
+                       key=lambda child: _rrstar_penalty(child.bbox, child._area, rect))
+        return node
     
     def _split_node(self, node):
         """Split a node that has exceeded max_children."""
-        k = node.size
         # mínimo de entradas por nodo (ceil(M/2))
         min_fill = max(1, (self.max_children + 1) // 2)
-        # elegir índice de corte garantizando que ambos lados tengan >= min_fill
-        mid = max(min_fill, min(k // 2, k - min_fill))
+        # reparto cuadrático de Guttman (ambos lados con >= min_fill)
+        group1, group2 = _quadratic_partition(node.children, min_fill)
         new_node = RTreeNode(self.node_count)
         self.node_count += 1
         new_node.is_leaf = node.is_leaf
-        new_node.children = node.children[mid:]
-        node.children = node.children[:mid]
+        new_node.children = group2
+        node.children = group1
+        if not new_node.is_leaf:
+            for child in new_node.children:
+                child.parent = new_node
 
         node.size = len(node.children)
         new_node.size = len(new_node.children)
@@ -167,46 +629,41 @@ class RTree:
             new_root.is_leaf = False
             new_root.children = [node, new_node]
             new_root.size = 2
+            node.parent = new_root
+            new_node.parent = new_root
             new_root.update_bbox()
             self.root = new_root
         else:
-            parent = self._find_parent(self.root, node)
+            parent = node.parent
+            new_node.parent = parent
             parent.children.append(new_node)
             parent.size += 1
             parent.update_bbox()
             if parent.size > self.max_children:
                 self._split_node(parent)
 
-    def _find_parent(self, current, child):
-        if current.is_leaf:
-            return None
-        for c in current.children:
-            if c == child:
-                return current
-            if not c.is_leaf:  # Solo buscar recursivamente en nodos internos
-                res = self._find_parent(c, child)
-                if res:
-                    return res
-        return None
-
     def search(self, key):
         """Search for all records that intersect the given bounding box."""
+        if self._packed is not None:
+            return self._packed.intersect(key)
+        return self._intersect_nodes(key)
+
+    def _intersect_nodes(self, query):
+        """Depth-first box search over the node objects with an explicit stack."""
+        qminx, qminy, qmaxx, qmaxy = query[0], query[1], query[2], query[3]
         results = []
-        self._search_recursive(self.root, key, results)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                results += [child[4] for child in node.children
+                            if child[2] >= qminx and child[0] <= qmaxx
+                            and child[3] >= qminy and child[1] <= qmaxy]
+            else:
+                # Reversed so children are visited left to right, as before
+                stack.extend(reversed(_overlapping_children(node, query)))
         return results
     
-    def _search_recursive(self, node, key, results):
-        if node.is_leaf:
-            for child in node.children:
-                if not (child[2] < key[0] or child[0] > key[2] or
-                        child[3] < key[1] or child[1] > key[3]):
-                    results.append(child[4])
-        else:
-            for child in node.children:
-                if not (child.bbox[2] < key[0] or child.bbox[0] > key[2] or
-                        child.bbox[3] < key[1] or child.bbox[1] > key[3]):
-                    self._search_recursive(child, key, results)
-    
     def rangeSearch(self, point, radius_or_k):
         """
         Range search with automatic mode detection:
@@ -221,69 +678,79 @@ class RTree:
             raise ValueError("Second parameter must be float (radius) or int (k)")
     
     def _range_search_radius(self, point, radius):
-        """Range search within a circular area using bbox mindist pruning."""
+        """Range search within a circular area using bbox mindist pruning.
+
+        Distances are compared squared against radius**2, so no sqrt is taken.
+        """
+        r2 = radius * radius
+        if self._packed is not None:
+            return self._packed.within(point, r2)
         results = []
-        def rect_tuple_mindist(rect, point):
-            px, py = point
-            minx, miny, maxx, maxy = rect[0], rect[1], rect[2], rect[3]
-            dx = 0 if minx <= px <= maxx else min(abs(px - minx), abs(px - maxx))
-            dy = 0 if miny <= py <= maxy else min(abs(py - miny), abs(py - maxy))
-            return (dx * dx + dy * dy) ** 0.5
-        def recurse(node):
-            if node.mindist_to_point(point) > radius:
-                return 
+        px, py = point[0], point[1]
+        if self.root.mindist2_to_point(point) > r2:
+            return results
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
             if node.is_leaf:
-                for child in node.children:
-                    if rect_tuple_mindist(child, point) <= radius:
-                        results.append(child[4])
+                results += [child[4] for child in node.children
+                            if _mindist2(child[0], child[1], child[2], child[3], px, py) <= r2]
             else:
-                for child in node.children:
-                    if child.mindist_to_point(point) <= radius:
-                        recurse(child)
-        recurse(self.root)
+                hits = [child for child in node.children
+                        for minx, miny, maxx, maxy in (child.bbox,)
+                        if _mindist2(minx, miny, maxx, maxy, px, py) <= r2]
+                stack.extend(reversed(hits))
         return results
 
     def _range_search_k(self, point, k):
-        """Range search for the k nearest neighbors to a point."""
-        results = []
-        def recurse(node):
+        """Range search for the k nearest neighbors to a point.
+
+        Best-first search: nodes are expanded in order of their mindist to
+        the point from a priority queue, and the k best entries seen so far
+        are kept in a bounded max-heap. The search stops as soon as the
+        closest unexpanded node is farther than the current k-th result.
+        """
+        if k <= 0 or self.is_empty():
+            return []
+        if self._packed is not None:
+            return self._packed.nearest(point, k)
+        px, py = point[0], point[1]
+        # Distances are kept squared: same order, no sqrt per entry
+        best = []  # max-heap of (-dist2, seq, payload)
+        frontier = [(0.0, 0, self.root)]
+        seq = 1
+        while frontier:
+            dist, _, node = heapq.heappop(frontier)
+            if len(best) == k and dist > -best[0][0]:
+                break
             if node.is_leaf:
                 for child in node.children:
                     cx = (child[0] + child[2]) / 2.0
                     cy = (child[1] + child[3]) / 2.0
-                    dist = ((cx - point[0]) ** 2 + (cy - point[1]) ** 2) ** 0.5
-                    results.append((dist, child[4]))
-                results.sort(key=lambda x: x[0])
+                    d = (cx - px) ** 2 + (cy - py) ** 2
+                    if len(best) < k:
+                        heapq.heappush(best, (-d, seq, child[4]))
+                    elif d < -best[0][0]:
+                        heapq.heapreplace(best, (-d, seq, child[4]))
+                    seq += 1
             else:
-                mindists = [(child.mindist_to_point(point), child) for child in node.children]
-                mindists.sort(key=lambda x: x[0])
-                for _, child in mindists:
-                    recurse(child)
-                    if len(results) >= k:
-                        break
-        recurse(self.root)
-        return [r for _, r in results[:k]]
+                for child in node.children:
+                    d = child.mindist2_to_point(point)
+                    if len(best) < k or d <= -best[0][0]:
+                        heapq.heappush(frontier, (d, seq, child))
+                        seq += 1
+        best.sort(key=lambda e: (-e[0], e[1]))
+        return [payload for _, _, payload in best]
 
     def intersection_search(self, bbox):
         """Search for all records intersecting the given bounding box."""
-        results = []
-        self._intersection_search_recursive(self.root, bbox, results)
-        return results
-    
-    def _intersection_search_recursive(self, node, bbox, results):
-        if node.is_leaf:
-            for child in node.children:
-                if not (child[2] < bbox[0] or child[0] > bbox[2] or
-                        child[3] < bbox[1] or child[1] > bbox[3]):
-                    results.append(child[4])
-        else:
-            for child in node.children:
-                if not (child.bbox[2] < bbox[0] or child.bbox[0] > bbox[2] or
-                        child.bbox[3] < bbox[1] or child.bbox[1] > bbox[3]):
-                    self._intersection_search_recursive(child, bbox, results)
+        if self._packed is not None:
+            return self._packed.intersect(bbox)
+        return self._intersect_nodes(bbox)
 
     def delete(self, key):
         """Delete a record from the R-Tree"""
+        self._unpack()
         deleted_nodes = []
         self._delete_recursive(self.root, key, deleted_nodes)
         
@@ -306,25 +773,31 @@ class RTree:
         # If root has only one child and is not a leaf, make child the new root
         if not self.root.is_leaf and self.root.size == 1:
              self.root = self.root.children[0]
+             self.root.parent = None
     
     def _delete_recursive(self, node, key, deleted_nodes):
         """Recursively search and delete the record"""
         if node.is_leaf:
-            # Remove matching records from leaf node
-            original_count = node.size
-            node.children = [child for child in node.children if child[4] != key]
-            node.size = len(node.children)
-            if node.size < original_count:
-                node.update_bbox()
-                # Check for underflow (less than m entries where m = max_children/2)
-                min_entries = max(1, self.max_children // 2)
-                if node.size < min_entries and node != self.root:
-                    # Node underflows - it will be deleted and entries reinserted
-                    deleted_nodes.append(node.children[:])  # Save entries for reinsertion
-                    node.children = []  # Mark node as deleted
-                    node.size = 0
-                    return True
-            return len(node.children) < original_count
+            # Remove matching records from leaf node: swap each match with the
+            # last entry and pop (leaf order is irrelevant), from the highest
+            # index down so the entry moved in is never a pending match
+            children = node.children
+            hits = [i for i, child in enumerate(children) if child[4] == key]
+            if not hits:
+                return False
+            for i in reversed(hits):
+                children[i] = children[-1]
+                children.pop()
+            node.size = len(children)
+            node.update_bbox()
+            # Check for underflow (less than m entries where m = max_children/2)
+            min_entries = max(1, self.max_children // 2)
+            if node.size < min_entries and node != self.root:
+                # Node underflows - it will be deleted and entries reinserted
+                deleted_nodes.append(node.children[:])  # Save entries for reinsertion
+                node.children = []  # Mark node as deleted
+                node.size = 0
+            return True
         else:
             # Internal node - search in children
             nodes_to_remove = []
@@ -334,10 +807,10 @@ class RTree:
                     if not child.children:  # Child node was deleted (empty)
                         nodes_to_remove.append(i)
             
-            # Remove deleted child nodes
-            for i in reversed(nodes_to_remove):
-                node.children.pop(i)
-                node.size -= 1
+            # Remove deleted child nodes in a single pass
+            if nodes_to_remove:
+                node.children = [child for child in node.children if child.children]
+                node.size = len(node.children)
             
             if node.size:  # If node still has children
                 node.update_bbox()
@@ -376,6 +849,10 @@ class RTreeIndex:
         self.fields = fields  # List of field definitions for spatial data
         self.rtree = RTree(max_children=max_children)
         self.id_to_pos = {}
+        # Los ids enteros densos (0, 1, 2, ...) guardan id -> posición en un
+        # array('q') indexado por id (-1 = ausente) en vez del dict: 8 bytes por
+        # entrada y sin hash. Los demás ids siguen en id_to_pos
+        self._pos_by_id = array('q')
         self._loaded = False
         self.file_manager = file_manager
 
@@ -407,19 +884,41 @@ class RTreeIndex:
         self.rtree.insert((rec_id, x, y))
         # guardar mapeo id -> posición en archivo si se suministró
         if pos is not None:
-            self.id_to_pos[rec_id] = pos
+            self._set_pos(rec_id, pos)
         return rec_id
 
+    def _set_pos(self, rec_id, pos):
+        pos_by_id = self._pos_by_id
+        if type(rec_id) is int and 0 <= rec_id < 2 * len(pos_by_id) + 64:
+            if rec_id >= len(pos_by_id):
+                pos_by_id.extend(array('q', [-1]) * (rec_id + 1 - len(pos_by_id)))
+            pos_by_id[rec_id] = pos
+        else:
+            self.id_to_pos[rec_id] = pos
+
     def search(self, rec_id):
         """Return the file position for rec_id (or None)."""
+        pos_by_id = self._pos_by_id
+        if type(rec_id) is int and 0 <= rec_id < len(pos_by_id):
+            pos = pos_by_id[rec_id]
+            if pos >= 0:
+                return pos
         return self.id_to_pos.get(rec_id)
-    
+
     def load_from_file(self):
-        """Build the R-tree from the FileManager contents (if provided)."""
+        """Load the saved index file, or build the R-tree from the FileManager."""
+        if self._load_index_file():
+            self._loaded = True
+            return True
         if not self.file_manager:
             return False
+        # Records keep their values by position in the table, not as attributes
+        names = [field.name for field in self.file_manager.table.fields]
+        if self.fields[0].name not in names or self.fields[1].name not in names:
+            return False
+        xi, yi = names.index(self.fields[0].name), names.index(self.fields[1].name)
         idx = 0
-        any_inserted = False
+        points = []
         while True:
             record = self.file_manager.read_record(idx)
             if record is None:
@@ -427,21 +926,91 @@ class RTreeIndex:
             # Only valid records (not logically deleted) - using .next == 0 convention
             if getattr(record, 'next', 0) == 0:
                 try:
-                    rec_id = getattr(record, 'key', None) or getattr(record, 'id', None)
-                    x = getattr(record, self.fields[0].name)
-                    y = getattr(record, self.fields[1].name)
+                    rec_id = getattr(record, 'key', None)
+                    if rec_id is None:
+                        rec_id = getattr(record, 'id', None)
+                    x = record.values[xi]
+                    y = record.values[yi]
                 except Exception:
                     idx += 1
                     continue
-                self.rtree.insert((rec_id, float(x), float(y)))
-                self.id_to_pos[rec_id] = idx
-                any_inserted = True
+                points.append((rec_id, float(x), float(y)))
+                self._set_pos(rec_id, idx)
             idx += 1
+        # Pack the whole file at once instead of one insert (and its splits) per record
+        if self.rtree.is_empty():
+            self.rtree = RTree.bulk_load(points, max_children=self.rtree.max_children)
+        else:
+            for point in points:
+                self.rtree.insert(point)
         self._loaded = True
-        return any_inserted
+        return bool(points)
+
+    MAGIC = b'RTI2'
+    # magic, max_children, data record count, data free-list head,
+    # len(_pos_by_id), len(id_to_pos), bytes of the id_to_pos ids, their code
+    HEADER = struct.Struct('=4siqqqqq1s')
+
+    def _data_state(self):
+        """(record count, free-list head) of the data file; (-1, -1) without one."""
+        fm = self.file_manager
+        if fm is None:
+            return -1, -1
+        return fm.file_size, fm.free_list_head
 
     def save_to_file(self):
-        """No-op placeholder for persistence (implement if needed)."""
+        """Write the packed tree and the id -> position map to index_filename."""
+        rtree = self.rtree
+        try:
+            packed = rtree._packed if rtree._packed is not None else _PackedRTree(rtree.root)
+            ids_code, ids = _pack_values(list(self.id_to_pos))
+            parts = [self.HEADER.pack(self.MAGIC, rtree.max_children, *self._data_state(),
+                                      len(self._pos_by_id), len(self.id_to_pos), len(ids), ids_code),
+                     self._pos_by_id.tobytes(), ids, array('q', self.id_to_pos.values()).tobytes(),
+                     packed.to_bytes()]
+            directory = os.path.dirname(self.index_filename)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.index_filename, 'wb') as f:
+                f.write(b''.join(parts))
+            return True
+        except Exception as e:
+            print(f"[RTREE] Error guardando índice en '{self.index_filename}': {e}")
+            return False
+
+    def _load_index_file(self):
+        """
+        Load a file written by save_to_file. False if there is none, or if it
+        was saved for a different record count / free list of the data file
+        (a stale snapshot): then load_from_file rebuilds from the data file.
+        """
+        if not os.path.exists(self.index_filename):
+            return False
+        try:
+            with open(self.index_filename, 'rb') as f:
+                data = f.read()
+            (magic, max_children, n_records, free_head,
+             n_pos, n_ids, ids_size, ids_code) = self.HEADER.unpack_from(data, 0)
+            if magic != self.MAGIC or (n_records, free_head) != self._data_state():
+                return False
+            offset = self.HEADER.size
+            pos_by_id = array('q')
+            pos_by_id.frombytes(data[offset:offset + 8 * n_pos])
+            offset += 8 * n_pos
+            ids = _unpack_values(ids_code, data[offset:offset + ids_size], n_ids)
+            offset += ids_size
+            positions = array('q')
+            positions.frombytes(data[offset:offset + 8 * n_ids])
+            offset += 8 * n_ids
+            packed = _PackedRTree.from_bytes(data[offset:])
+        except Exception as e:
+            print(f"[RTREE] Error cargando índice desde '{self.index_filename}': {e}")
+            return False
+        self.rtree = RTree(max_children=max_children)
+        self.rtree.root = None
+        self.rtree._packed = packed
+        self._pos_by_id = pos_by_id
+        self.id_to_pos = dict(zip(ids, positions))
         return True
 
     # Optional wrappers for spatial queries returning ids
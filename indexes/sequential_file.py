@@ -1,12 +1,57 @@
 import os
+import re
+import mmap
+import math
+from pathlib import Path
 import struct
-import heapq # Útil para el merge en _rebuild
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from operator import itemgetter
 from core.models import Table, Record
 from typing import List, Any, Union
 
 # K: Número de registros en el auxiliar antes de reconstruir 
 K_THRESHOLD = 5 
 
+# Con K fijo cada rebuild reescribe todo el .dat cada K inserciones (O(N/K)
+# por inserción). Si está activo, el umbral efectivo crece como sqrt(N) del
+# .dat, y el costo amortizado baja a O(sqrt(N)); las búsquedas en el .aux
+# siguen siendo binarias sobre su índice, así que un .aux mayor no las frena
+ADAPTIVE_K = True
+
+# Buffer de escritura del .dat nuevo durante _rebuild
+REBUILD_BUFFER = 1 << 20
+
+# _rebuild hace un solo fsync del .dat nuevo antes de reemplazar el anterior
+# y otro del directorio después, para que el reemplazo sobreviva a una caída
+SYNC_REBUILD = True
+
+# Registros decodificados por bloque en los recorridos de rango del .dat
+RANGE_BLOCK = 64
+
+# Bytes por bloque del índice disperso (fence posts) de llaves str del .dat
+FENCE_BLOCK = 4096
+
+# Patrones de acceso para el kernel: las búsquedas binarias saltan por el
+# archivo (sin lectura anticipada) y los recorridos lo leen en orden
+_MADV_RANDOM = getattr(mmap, 'MADV_RANDOM', None)
+_MADV_SEQUENTIAL = getattr(mmap, 'MADV_SEQUENTIAL', None)
+
+
+# Tramos de bytes distintos de cero (para ubicar los next != 0 en C)
+_NONZERO = re.compile(rb'[^\x00]+')
+
+
+def _madvise(mm: mmap.mmap, advice, start: int = 0):
+    """madvise desde `start` (alineado a página) hasta el final; se ignora si no se soporta."""
+    if advice is None or not hasattr(mm, 'madvise'):
+        return
+    start -= start % mmap.PAGESIZE
+    try:
+        mm.madvise(advice, start, len(mm) - start)
+    except (OSError, ValueError):
+        pass
+
 class SequentialIndex:
     """
     Implementa la técnica de Archivo Secuencial Indexado con un 
@@ -18,8 +63,12 @@ class SequentialIndex:
     def __init__(self, data_filename: str, table: Table):
         self.table = table
         self.data_filename = data_filename
-        self.aux_filename = data_filename.replace('.dat', '.aux')
+        self.aux_filename = str(Path(data_filename).with_suffix('.aux'))
         self.record_size = table.record_size
+        # Struct que decodifica solo (llave, next) de un registro: las búsquedas
+        # comparan llaves sin construir el Record completo en cada paso
+        self._key_flag = table.key_flag_struct
+        self._key_is_str = table.fields[table.index].data_type == str
         
         # K_THRESHOLD es el 'K' de las especificaciones 
         self.K_threshold = K_THRESHOLD 
@@ -31,6 +80,99 @@ class SequentialIndex:
             open(self.aux_filename, 'wb').close()
             
         self.aux_records_count = self._get_aux_count()
+        # Registros físicos del .dat (borrados incluidos); cambia solo en _rebuild
+        self.data_records_count = os.path.getsize(self.data_filename) // self.record_size
+        # Índice ordenado en memoria del .aux: (llave, offset) de cada copia viva.
+        # El archivo sigue siendo un log de inserción (lo leen otros recorridos);
+        # este índice da la búsqueda binaria y el orden para el merge
+        self._aux_index = None
+        # mmap de solo lectura del .dat para la búsqueda binaria (se abre al
+        # primer uso y se vuelve a abrir tras cada _rebuild)
+        self._dat_mm = None
+        # Llaves del .dat en orden (borrados incluidos), cacheadas junto al mmap:
+        # la búsqueda binaria es un bisect en C que no toca el archivo (o solo
+        # un bloque, con llaves str). Ver _data_keys
+        self._dat_keys = None
+        self._fence_step = max(1, FENCE_BLOCK // self.record_size)
+        # Descriptor de append del .aux, abierto durante toda la vida del
+        # índice. Sin buffer: cada add llega al archivo en el momento, que es
+        # lo que esperan los recorridos que leen el .aux directamente
+        self._aux_f = None
+        # Descriptores de escritura (por archivo) para las sobrescrituras en
+        # sitio; el del .dat se cierra en _rebuild porque cambia el archivo
+        self._write_fds = {}
+        # Descriptor de lectura del .aux (pread): el .aux se vacía en sitio en
+        # _rebuild, así que sigue siendo válido durante toda la vida del índice
+        self._aux_rfd = None
+        # El next es el último campo del registro: borrar es escribir solo
+        # sus bytes con la marca de eliminado, sin re-empaquetar el registro
+        self._next_offset = self.record_size - struct.calcsize(table.next_code)
+        self._tombstone = struct.pack(table.next_code, 1 if table.compact_tombstone else -1)
+
+    def _data_map(self):
+        """Devuelve el mmap del .dat, o None si el archivo no existe o está vacío."""
+        mm = self._dat_mm
+        if mm is None:
+            try:
+                with open(self.data_filename, 'rb') as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):  # ValueError: archivo vacío
+                return None
+            # Acceso aleatorio: que el kernel no lea por adelantado
+            _madvise(mm, _MADV_RANDOM)
+            self._dat_mm = mm
+        return mm
+
+    def _close_data_map(self):
+        if self._dat_mm is not None:
+            self._dat_mm.close()
+            self._dat_mm = None
+        self._dat_keys = None
+
+    def _data_keys(self, mm) -> Union[array, list]:
+        """
+        Llaves del .dat en orden físico; solo cambian en _rebuild.
+        - Numéricas: todas, en un array compacto (4 bytes por registro).
+        - str: solo la primera de cada bloque de _fence_step registros (~4 KiB),
+          sin el relleno \x00. Una lista con cada llave str costaría decenas de
+          bytes por registro; con las fence posts la búsqueda lee un solo bloque.
+        """
+        if self._dat_keys is None:
+            rs = self.record_size
+            n = len(mm) // rs
+            if self._key_is_str:
+                unpack_from = self._key_flag.unpack_from
+                self._dat_keys = [unpack_from(mm, i * rs)[0].rstrip(b'\x00')
+                                  for i in range(0, n, self._fence_step)]
+            else:
+                code = 'i' if self.table.fields[self.table.index].data_type == int else 'f'
+                with memoryview(mm) as mv, mv[:n * rs] as body:
+                    self._dat_keys = array(code, [key for key, _ in self._key_flag.iter_unpack(body)])
+        return self._dat_keys
+
+    def close(self):
+        """Libera el mmap del .dat y los descriptores abiertos."""
+        self._close_data_map()
+        for filename in list(self._write_fds):
+            self._close_write_fd(filename)
+        if self._aux_f is not None:
+            self._aux_f.close()
+            self._aux_f = None
+        if self._aux_rfd is not None:
+            os.close(self._aux_rfd)
+            self._aux_rfd = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _append_aux(self, data: bytes):
+        """Añade `data` al final del .aux con una sola escritura (sin open/close)."""
+        if self._aux_f is None:
+            self._aux_f = open(self.aux_filename, 'ab', buffering=0)
+        self._aux_f.write(data)
 
     def _get_aux_count(self) -> int:
         """Helper para contar cuántos registros hay en el archivo auxiliar."""
@@ -39,22 +181,104 @@ class SequentialIndex:
         except OSError:
             return 0
 
+    def _pread(self, size: int, offset: int) -> bytes:
+        """Lectura posicional del .aux con el descriptor cacheado."""
+        if self._aux_rfd is None:
+            self._aux_rfd = os.open(self.aux_filename, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0)
+                                    | getattr(os, 'O_BINARY', 0))
+        if hasattr(os, 'pread'):
+            return os.pread(self._aux_rfd, size, offset)
+        os.lseek(self._aux_rfd, offset, os.SEEK_SET)
+        return os.read(self._aux_rfd, size)
+
+    def _read_aux(self) -> bytes:
+        """Lee el .aux completo en una sola llamada (solo registros completos)."""
+        if self.aux_records_count == 0:
+            return b''
+        try:
+            data = self._pread(self.aux_records_count * self.record_size, 0)
+        except FileNotFoundError:
+            return b''
+        return data[:len(data) - len(data) % self.record_size]
+
+    def _aux_entries(self) -> list:
+        """Índice (llave, offset) ordenado del .aux; se construye al primer uso."""
+        if self._aux_index is None:
+            rs = self.record_size
+            key_is_str = self._key_is_str
+            rows = self._key_flag.iter_unpack(self._read_aux())
+            if key_is_str:
+                entries = [(key.rstrip(b'\x00'), i * rs) for i, (key, next_ptr) in enumerate(rows)
+                           if next_ptr == 0]
+            else:
+                entries = [(key, i * rs) for i, (key, next_ptr) in enumerate(rows) if next_ptr == 0]
+            # Los offsets ya están en orden creciente: un sort estable solo por
+            # la llave deja el mismo orden que comparar las tuplas, pero
+            # compara un solo valor nativo por paso (~2x más rápido)
+            entries.sort(key=itemgetter(0))
+            self._aux_index = entries
+        return self._aux_index
+
+    def _index_appended(self, records: List[Record], first_offset: int):
+        """Registra en el índice del .aux los registros recién añadidos al final."""
+        if self._aux_index is None:
+            return  # Se construirá completo desde el archivo al primer uso
+        offset = first_offset
+        for record in records:
+            insort(self._aux_index, (self._probe(record.key), offset))
+            offset += self.record_size
+
     def add(self, record: Record):
         """
         Añade un registro al archivo auxiliar.
         Si el auxiliar supera K, reconstruye el archivo principal.
         """
         # 1. Escribir el nuevo registro al FINAL del archivo auxiliar
-        with open(self.aux_filename, 'ab') as f_aux:
-            f_aux.write(record.pack())
+        self._append_aux(record.pack())
         
+        self._index_appended([record], self.aux_records_count * self.record_size)
         self.aux_records_count += 1
         
         # 2. Comprobar si hemos alcanzado el umbral K 
-        if self.aux_records_count >= self.K_threshold:
-            print(f"Límite K={self.K_threshold} alcanzado. Reconstruyendo archivo principal...")
+        if self.aux_records_count >= self.rebuild_threshold():
+            print(f"Límite K={self.rebuild_threshold()} alcanzado. Reconstruyendo archivo principal...")
+            self._rebuild()
+
+    def add_many(self, records: List[Record]):
+        """
+        Añade varios registros al auxiliar con una sola escritura y
+        reconstruye (a lo más una vez) si se alcanza el umbral K.
+        """
+        if not records:
+            return
+        self._append_aux(b''.join(record.pack() for record in records))
+
+        self._index_appended(records, self.aux_records_count * self.record_size)
+        self.aux_records_count += len(records)
+
+        if self.aux_records_count >= self.rebuild_threshold():
+            print(f"Límite K={self.rebuild_threshold()} alcanzado. Reconstruyendo archivo principal...")
             self._rebuild()
 
+    def _dead_runs(self, mm, total: int) -> List[tuple]:
+        """
+        Tramos [inicio, fin) de registros consecutivos del .dat con next != 0,
+        sin decodificarlos: cada byte del campo next se toma con un slice con
+        paso record_size, se combinan con OR como enteros y se buscan los
+        tramos de bytes no nulos.
+        """
+        rs = self.record_size
+        flags = 0
+        for byte in range(self._next_offset, rs):
+            flags |= int.from_bytes(mm[byte:total * rs:rs], 'big')
+        return [m.span() for m in _NONZERO.finditer(flags.to_bytes(total, 'big'))]
+
+    def rebuild_threshold(self) -> int:
+        """Tamaño del .aux que dispara _rebuild: K, o sqrt(N) del .dat si es mayor."""
+        if not ADAPTIVE_K:
+            return self.K_threshold
+        return max(self.K_threshold, math.isqrt(self.data_records_count))
+
     def _rebuild(self):
         """
         Algoritmo de reconstrucción (merge).
@@ -62,70 +286,119 @@ class SequentialIndex:
         en un nuevo archivo .dat ordenado.
         """
         temp_filename = self.data_filename + '.tmp'
-        all_aux_records = []
+        rs = self.record_size
 
-        # 1. Leer TODOS los registros del archivo auxiliar y cargarlos a memoria
-        try:
-            with open(self.aux_filename, 'rb') as f_aux:
-                while True:
-                    data = f_aux.read(self.record_size)
-                    if not data:
-                        break
-                    record = Record.unpack(self.table, data)
-                    # Usamos 'next == 0' como "no borrado"
-                    if record.next == 0: 
-                        all_aux_records.append(record)
-        except FileNotFoundError:
-            pass # No hay archivo aux, no hay problema
-
-        # 2. Ordenar los registros auxiliares en memoria
-        all_aux_records.sort(key=lambda r: r.key)
+        # 1. Registros vivos del .aux: bytes crudos (una sola lectura) y su
+        # índice (llave, offset), que ya viene ordenado por llave
+        aux_data = memoryview(self._read_aux())
+        aux = self._aux_entries()
+        n_aux = len(aux)
 
-        # 3. Fusionar (Merge) el archivo .dat ordenado y la lista aux ordenada
-        try:
-            with open(self.data_filename, 'rb') as f_main, \
-                 open(temp_filename, 'wb') as f_temp:
-                
-                main_data = f_main.read(self.record_size)
-                aux_idx = 0
-                
-                while main_data or aux_idx < len(all_aux_records):
-                    main_record = None
-                    if main_data:
-                        main_record = Record.unpack(self.table, main_data)
-                        # Ignorar registros borrados en el principal
-                        if main_record.next != 0: 
-                            main_data = f_main.read(self.record_size)
-                            continue
-                    
-                    aux_record = all_aux_records[aux_idx] if aux_idx < len(all_aux_records) else None
-                    
-                    # Lógica de Merge
-                    if main_record and (not aux_record or main_record.key <= aux_record.key):
-                        # Escribir el registro del archivo principal
-                        f_temp.write(main_record.pack())
-                        main_data = f_main.read(self.record_size)
-                    elif aux_record:
-                        # Escribir el registro del archivo auxiliar
-                        f_temp.write(aux_record.pack())
-                        aux_idx += 1
-                    else:
-                        break # No hay más datos
+        # 2. Plan del merge, sin recorrer el .dat registro por registro en Python:
+        #  - cuts: registro del .dat antes del cual va cada uno del .aux (bisect
+        #    sobre las llaves cacheadas; ante llaves iguales va primero el .dat)
+        #  - dead: tramos de registros borrados del .dat (next != 0), ubicados en C
+        # Entre esos puntos el .dat se copia en tramos directamente del mmap.
+        mm = self._data_map()
+        total = len(mm) // rs if mm is not None else 0
+        if not total:
+            cuts = [0] * n_aux
+        elif self._key_is_str:
+            cuts = [self._lower_bound(mm, key, bisect_right) for key, _ in aux]
+        else:
+            keys = self._data_keys(mm)
+            cuts = [bisect_right(keys, key) for key, _ in aux]
+        dead = self._dead_runs(mm, total) if total else []
+        cuts.append(total)
+        aux_offsets = [offset for _, offset in aux]
+        aux_offsets.append(None)
+        dead.append((total, total))
 
-        except FileNotFoundError:
-             # Si el .dat no existe (primera vez), solo escribe el .aux
-             with open(temp_filename, 'wb') as f_temp:
-                 for record in all_aux_records:
-                     f_temp.write(record.pack())
+        with open(temp_filename, 'wb', buffering=REBUILD_BUFFER) as f_temp:
+            # Reservar de una vez el tamaño máximo posible (.dat + .aux vivos);
+            # al final se recorta a lo escrito
+            self._preallocate(f_temp.fileno(), (total + n_aux) * rs)
+            if mm is not None:
+                _madvise(mm, _MADV_SEQUENTIAL)
+            with memoryview(mm if mm is not None else b'') as main:
+                # Tramos del .dat y registros del .aux, en orden; se escriben
+                # con un solo writelines (el bucle en C del BufferedWriter)
+                parts = []
+                add = parts.append
+                pos = dead_idx = 0
+                skip, skip_end = dead[0]
+                # El centinela (total, None) copia lo que quede del .dat
+                for cut, offset in zip(cuts, aux_offsets):
+                    # Copiar el .dat hasta `cut` saltando los tramos borrados
+                    # (un tramo se corta si algún registro del .aux va en medio)
+                    while skip < cut:
+                        if pos < skip:
+                            add(main[pos * rs:skip * rs])
+                        if skip_end <= cut:
+                            pos = skip_end
+                            dead_idx += 1
+                            skip, skip_end = dead[dead_idx]
+                        else:
+                            pos = skip = cut
+                    if pos < cut:
+                        add(main[pos * rs:cut * rs])
+                        pos = cut
+                    if offset is None:
+                        break
+                    add(aux_data[offset:offset + rs])
+                f_temp.writelines(parts)
+                parts.clear()  # Suelta los tramos del mmap antes de cerrarlo
+            if mm is not None:
+                _madvise(mm, _MADV_RANDOM)
+            f_temp.flush()
+            os.ftruncate(f_temp.fileno(), f_temp.tell())
+            self.data_records_count = f_temp.tell() // rs
+            if SYNC_REBUILD:
+                os.fsync(f_temp.fileno())
 
-        # 4. Reemplazar archivos
+        # 3. Reemplazar archivos (el mmap y el descriptor apuntan al .dat anterior)
+        self._close_data_map()
+        self._close_write_fd(self.data_filename)
         os.replace(temp_filename, self.data_filename)
+        if SYNC_REBUILD:
+            self._sync_dir(os.path.dirname(os.path.abspath(self.data_filename)))
         
-        # 5. Limpiar el archivo auxiliar
-        open(self.aux_filename, 'wb').close()
+        # 4. Limpiar el archivo auxiliar (el descriptor de append sigue válido)
+        if self._aux_f is not None:
+            self._aux_f.truncate(0)
+        else:
+            open(self.aux_filename, 'wb').close()
         self.aux_records_count = 0
+        self._aux_index = []
         print("Reconstrucción completada.")
 
+    @staticmethod
+    def _sync_dir(path: str):
+        """fsync del directorio (persiste el os.replace); no existe en Windows."""
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _preallocate(fd: int, size: int):
+        """Reserva `size` bytes para el archivo (posix_fallocate o ftruncate)."""
+        if size <= 0:
+            return
+        try:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        except OSError:
+            pass  # Sin reserva el archivo crece con cada escritura
+
     def _search_record(self, key: Any) -> Union[Record, None]:
         """Método interno que busca y devuelve Record (para uso interno)"""
         # 1. Búsqueda binaria en el archivo principal (.dat)
@@ -148,51 +421,101 @@ class SequentialIndex:
         return None
 
 
+    def _probe(self, key: Any):
+        """
+        La llave tal como la devuelve _key_flag: las str quedan en bytes (sin el
+        relleno \x00), y el orden de sus bytes UTF-8 es el mismo que el de str.
+        """
+        if self._key_is_str and isinstance(key, str):
+            return key.encode('utf-8')
+        return key
+
+    def _find_in_data_file(self, key: Any):
+        """
+        Helper: búsqueda binaria en el .dat (ordenado) sobre las llaves
+        cacheadas; solo se lee del mmap el registro encontrado.
+        Devuelve (offset, record) o None.
+        """
+        mm = self._data_map()
+        if mm is None:
+            return None
+        rs = self.record_size
+        probe = self._probe(key)
+        i = self._lower_bound(mm, probe)
+        if i < len(mm) // rs:
+            found_key = self._key_flag.unpack_from(mm, i * rs)[0]
+            if self._key_is_str:
+                found_key = found_key.rstrip(b'\x00')
+            if found_key == probe:
+                return i * rs, Record.unpack_from(self.table, mm, i * rs)
+        return None
+
+    def _iter_keys(self, mm, start: int):
+        """
+        Recorre el .dat desde el registro `start` entregando (offset, llave,
+        next), decodificados por bloques de RANGE_BLOCK registros para no
+        copiar el resto del archivo cuando el recorrido termina pronto.
+        """
+        rs = self.record_size
+        iter_unpack = self._key_flag.iter_unpack
+        key_is_str = self._key_is_str
+        total = len(mm) // rs
+        i = start
+        while i < total:
+            stop = min(total, i + RANGE_BLOCK)
+            offset = i * rs
+            for key, next_ptr in iter_unpack(mm[offset:stop * rs]):
+                yield offset, key.rstrip(b'\x00') if key_is_str else key, next_ptr
+                offset += rs
+            i = stop
+
+    def _lower_bound(self, mm, probe, bound=bisect_left) -> int:
+        """
+        Índice del primer registro del .dat con llave >= probe (borrados
+        incluidos); con bound=bisect_right, el del primero con llave > probe.
+        """
+        keys = self._data_keys(mm)
+        if not self._key_is_str:
+            return bound(keys, probe)
+        # Fence posts: el bloque b es el primero cuya llave inicial ya no cumple
+        # la condición, así que la respuesta está en el bloque b-1 (o es el
+        # inicio del bloque b)
+        block = bound(keys, probe)
+        if block == 0:
+            return 0
+        rs = self.record_size
+        start = (block - 1) * self._fence_step
+        stop = min(start + self._fence_step, len(mm) // rs)
+        with memoryview(mm) as mv, mv[start * rs:stop * rs] as body:
+            page = [key.rstrip(b'\x00') for key, _ in self._key_flag.iter_unpack(body)]
+        return start + bound(page, probe)
+
+    def _find_in_aux_file(self, key: Any):
+        """
+        Helper: búsqueda binaria en el índice ordenado del .aux. Devuelve
+        (offset, record) de la primera copia viva, o None (las copias borradas
+        no están en el índice).
+        """
+        entries = self._aux_entries()
+        probe = self._probe(key)
+        i = bisect_left(entries, (probe,))
+        if i == len(entries) or entries[i][0] != probe:
+            return None
+        offset = entries[i][1]
+        return offset, Record.unpack(self.table, self._pread(self.record_size, offset))
+
     def _binary_search_data_file(self, key: Any) -> Union[Record, None]:
         """Helper: Búsqueda binaria en el archivo .dat físicamente ordenado."""
-        try:
-            with open(self.data_filename, 'rb') as f:
-                f.seek(0, os.SEEK_END)
-                total_records = f.tell() // self.record_size
-                low = 0
-                high = total_records - 1
-                
-                while low <= high:
-                    mid = (low + high) // 2
-                    f.seek(mid * self.record_size)
-                    data = f.read(self.record_size)
-                    if not data:
-                        break
-                        
-                    record = Record.unpack(self.table, data)
-                    
-                    if record.key == key:
-                        # Encontrado, pero solo si no está borrado
-                        return record if record.next == 0 else None
-                    elif record.key < key:
-                        low = mid + 1
-                    else:
-                        high = mid - 1
-                        
-        except FileNotFoundError:
-            return None
+        found = self._find_in_data_file(key)
+        # Encontrado, pero solo si no está borrado
+        if found and found[1].next == 0:
+            return found[1]
         return None
 
     def _linear_search_aux_file(self, key: Any) -> Union[Record, None]:
         """Helper: Búsqueda lineal en el archivo .aux."""
-        try:
-            with open(self.aux_filename, 'rb') as f_aux:
-                while True:
-                    data = f_aux.read(self.record_size)
-                    if not data:
-                        break
-                    record = Record.unpack(self.table, data)
-                    if record.key == key:
-                         # Encontrado, pero solo si no está borrado
-                        return record if record.next == 0 else None
-        except FileNotFoundError:
-            return None
-        return None
+        found = self._find_in_aux_file(key)
+        return found[1] if found else None
 
     def rangeSearch(self, begin_key: Any, end_key: Any) -> List[Record]:
         """
@@ -201,41 +524,36 @@ class SequentialIndex:
         """
         results = []
         
-        # 1. Búsqueda en .dat
-        try:
-            with open(self.data_filename, 'rb') as f_main:
-                while True:
-                    data = f_main.read(self.record_size)
-                    if not data:
+        # 1. Búsqueda en .dat: búsqueda binaria del primer registro >= begin_key
+        # y recorrido secuencial desde ahí, en vez de leer todo el archivo
+        mm = self._data_map()
+        if mm is not None:
+            end = self._probe(end_key)
+            start = self._lower_bound(mm, self._probe(begin_key))
+            # Lectura anticipada solo mientras dura el recorrido
+            _madvise(mm, _MADV_SEQUENTIAL, start * self.record_size)
+            try:
+                for offset, key, next_ptr in self._iter_keys(mm, start):
+                    if key > end:
+                        # Como el .dat está ordenado, podemos parar aquí
                         break
-                    record = Record.unpack(self.table, data)
-                    
-                    if record.next == 0: # No borrado
-                        if record.key > end_key:
-                            # Como el .dat está ordenado, podemos parar aquí
-                            break
-                        if record.key >= begin_key:
-                            results.append(record)
-                            
-        except FileNotFoundError:
-            pass
+                    if next_ptr == 0: # No borrado
+                        results.append(Record.unpack_from(self.table, mm, offset))
+            finally:
+                _madvise(mm, _MADV_RANDOM, start * self.record_size)
+
+        # 2. Búsqueda en .aux: solo el tramo [begin_key, end_key] de su índice
+        entries = self._aux_entries()
+        begin, end = self._probe(begin_key), self._probe(end_key)
+        i = bisect_left(entries, (begin,))
+        offsets = []
+        while i < len(entries) and entries[i][0] <= end:
+            offsets.append(entries[i][1])
+            i += 1
+        if offsets:
+            data = self._read_aux()
+            results += [Record.unpack_from(self.table, data, offset) for offset in offsets]
 
-        # 2. Búsqueda en .aux
-        try:
-            with open(self.aux_filename, 'rb') as f_aux:
-                while True:
-                    data = f_aux.read(self.record_size)
-                    if not data:
-                        break
-                    record = Record.unpack(self.table, data)
-                    
-                    if record.next == 0: # No borrado
-                        if begin_key <= record.key <= end_key:
-                            results.append(record)
-                            
-        except FileNotFoundError:
-            pass
-            
         return results
 
     def range_search(self, begin_key: Any, end_key: Any) -> List[Any]:
@@ -246,6 +564,29 @@ class SequentialIndex:
         records = self.rangeSearch(begin_key, end_key)  # Llama al método original
         return [record.values for record in records]  # Convierte a valores
 
+    def get_all(self) -> List[Record]:
+        """
+        Todos los registros vivos en orden de llave. Se filtra sobre las tuplas
+        crudas de iter_unpack (solo las vivas llegan a ser Record) y el .aux
+        sale ya ordenado de su índice, así que el sort final solo fusiona dos
+        tramos ordenados (timsort lo hace en una pasada, en C).
+        """
+        table = self.table
+        unpack = Record.unpack_from_row
+        results = []
+        mm = self._data_map()
+        if mm is not None:
+            with memoryview(mm) as mv, mv[:len(mm) - len(mm) % self.record_size] as body:
+                results = [unpack(table, row) for row in table.record_struct.iter_unpack(body)
+                           if row[-1] == 0]
+        entries = self._aux_entries()
+        if entries:
+            data = self._read_aux()
+            results += [Record.unpack_from(table, data, offset) for _, offset in entries]
+            # Estable: ante llaves iguales queda primero el del .dat
+            results.sort(key=lambda record: record.key)
+        return results
+
     def remove(self, key: Any) -> bool:
         """
         Propuesta de eliminación [cite: 22-23]: Eliminación Lógica (Tombstone).
@@ -253,63 +594,78 @@ class SequentialIndex:
         La reconstrucción (_rebuild) se encargará de purgarlo físicamente.
         """
         
-        # 1. Intentar encontrar y marcar en .dat
-        try:
-            with open(self.data_filename, 'r+b') as f:
-                f.seek(0, os.SEEK_END)
-                total_records = f.tell() // self.record_size
-                low = 0
-                high = total_records - 1
-                
-                while low <= high:
-                    mid = (low + high) // 2
-                    offset = mid * self.record_size
-                    f.seek(offset)
-                    data = f.read(self.record_size)
-                    if not data: break
-                        
-                    record = Record.unpack(self.table, data)
-                    
-                    if record.key == key:
-                        if record.next == 0: # Si no está ya borrado
-                            record.next = -1 # Marcar como borrado
-                            f.seek(offset) # Regresar a la posición
-                            f.write(record.pack()) # Sobrescribir
-                            return True
-                        else:
-                            return False # Ya estaba borrado
-                    elif record.key < key:
-                        low = mid + 1
-                    else:
-                        high = mid - 1
-        except FileNotFoundError:
-            pass
+        # 1. Intentar encontrar y marcar en .dat (si ya estaba borrado ahí,
+        # puede haberse reinsertado en .aux)
+        found = self._find_in_data_file(key)
+        if found and found[1].next == 0:
+            # Marcar como borrado: solo se escriben los bytes del next
+            self._write_at(self.data_filename, found[0] + self._next_offset, self._tombstone)
+            return True
             
         # 2. Si no, intentar encontrar y marcar en .aux
-        try:
-            with open(self.aux_filename, 'r+b') as f_aux:
-                offset = 0
-                while True:
-                    data = f_aux.read(self.record_size)
-                    if not data: break
-                        
-                    record = Record.unpack(self.table, data)
-                    
-                    if record.key == key:
-                        if record.next == 0:
-                            record.next = -1
-                            f_aux.seek(offset)
-                            f_aux.write(record.pack())
-                            return True
-                        else:
-                            return False # Ya estaba borrado
-                    
-                    offset += self.record_size
-        except FileNotFoundError:
-            return False
+        found = self._find_in_aux_file(key)
+        if found:
+            offset = found[0]
+            self._write_at(self.aux_filename, offset + self._next_offset, self._tombstone)
+            entries = self._aux_entries()
+            del entries[bisect_left(entries, (self._probe(key), offset))]
+            return True
 
         return False # No se encontró
 
+    def _locate(self, key: Any):
+        """
+        Helper: devuelve (archivo, offset) del registro vivo con esa llave,
+        buscando binariamente en .dat y luego linealmente en .aux.
+        Devuelve None si no existe o está borrado.
+        """
+        found = self._find_in_data_file(key)
+        if found and found[1].next == 0:
+            return self.data_filename, found[0]
+        # Borrado en .dat (o ausente); puede haberse reinsertado en .aux
+        found = self._find_in_aux_file(key)
+        if found:
+            return self.aux_filename, found[0]
+        return None
+
+    def update_inplace(self, key: Any, new_record: Record) -> bool:
+        """
+        Sobrescribe el registro en la misma ranura donde ya vive (.dat o .aux),
+        sin eliminación lógica ni reinserción. Solo es válido si la llave no cambia;
+        si cambia, se hace remove + add como antes.
+        """
+        if new_record.key != key:
+            if self.remove(key):
+                self.add(new_record)
+                return True
+            return False
+
+        location = self._locate(key)
+        if location is None:
+            return False
+        filename, offset = location
+        new_record.next = 0
+        self._write_at(filename, offset, new_record.pack())
+        return True
+
+    def _write_at(self, filename: str, offset: int, data: bytes):
+        """Escribe `data` en `offset` sin mover ningún cursor compartido."""
+        fd = self._write_fds.get(filename)
+        if fd is None:
+            # Sin O_APPEND: en Linux pwrite ignora el offset en modo append
+            fd = os.open(filename, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            self._write_fds[filename] = fd
+        if hasattr(os, 'pwrite'):
+            os.pwrite(fd, data, offset)
+        else:
+            os.lseek(fd, offset, os.SEEK_SET)
+            os.write(fd, data)
+
+    def _close_write_fd(self, filename: str):
+        fd = self._write_fds.pop(filename, None)
+        if fd is not None:
+            os.close(fd)
+
     # --- Métodos requeridos por la interfaz genérica de DatabaseManager ---
     # (Estos métodos son para que se parezca a BPlusTree e ISAM)
 
@@ -318,6 +674,10 @@ class SequentialIndex:
         Inserta clave/valor en Sequential File.
         Ahora acepta (key, value) como las otras estructuras.
         """
+        # Un lote de Records va completo al .aux con una sola escritura
+        if isinstance(value, (list, tuple)) and value and isinstance(value[0], Record):
+            return self.add_many(list(value))
+
         # Convertir value a Record si es necesario
         if isinstance(value, Record):
             record = value
@@ -346,5 +706,4 @@ class SequentialIndex:
             self._rebuild()
 
     def is_empty(self) -> bool:
-        return self._get_aux_count() == 0 and \
-               (not os.path.exists(self.data_filename) or os.path.getsize(self.data_filename) == 0)
\ No newline at end of file
+        return self.aux_records_count == 0 and self.data_records_count == 0
\ No newline at end of file
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Tests de persistencia del árbol B+: formato binario de nodos (BPT1),
+checkpoints de solo nodos sucios y reaplicación del log tras una caída.
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.models import Table, Field, Record
+from indexes.bplus import BPlusTree, BPlusTreePersistence
+
+
+class TestBPlusPersistence(unittest.TestCase):
+    """Tests de guardado/carga del B+ con su archivo de datos."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index_filename = os.path.join(self.tmp.name, 'tabla.idx')
+        self.table = Table('tabla', [Field('id', int), Field('nombre', str, 12)], 'id')
+        self.trees = []
+
+    def tearDown(self):
+        for tree in self.trees:
+            tree.close()
+        self.tmp.cleanup()
+
+    def _open(self, load=True) -> BPlusTree:
+        tree = BPlusTree(order=4, index_filename=self.index_filename, table=self.table)
+        self.trees.append(tree)
+        if load:
+            tree.load_from_file()
+        return tree
+
+    def _log_size(self) -> int:
+        log_filename = self.index_filename + 'log'
+        return os.path.getsize(log_filename) if os.path.exists(log_filename) else 0
+
+    def _assert_contents(self, tree, expected):
+        self.assertEqual([key for key, _ in tree.range_search(-10 ** 9, 10 ** 9)], sorted(expected))
+        for key, name in expected.items():
+            record = tree.get_record(key)
+            self.assertIsNotNone(record, key)
+            self.assertEqual(record.values, [key, name])
+
+    def test_checkpoint_roundtrip(self):
+        """Test guardar y cargar el .idx binario (magic BPT1) sin operaciones en el log."""
+        tree = self._open(load=False)
+        expected = {}
+        with tree.batched():
+            for i in range(0, 300, 3):
+                tree.add_record(Record(self.table, [i, 'n%d' % i]))
+                expected[i] = 'n%d' % i
+        tree.close()
+        with open(self.index_filename, 'rb') as f:
+            self.assertEqual(f.read(4), BPlusTreePersistence.MAGIC)
+        self.assertEqual(self._log_size(), 0)
+
+        tree = self._open()
+        self._assert_contents(tree, expected)
+
+    def test_log_replay_after_crash(self):
+        """Test que las operaciones posteriores al checkpoint se reaplican desde el log."""
+        tree = self._open(load=False)
+        expected = {}
+        with tree.batched():
+            for i in range(100):
+                tree.add_record(Record(self.table, [i, 'n%d' % i]))
+                expected[i] = 'n%d' % i
+        # Sin checkpoint: cada operación queda solo en el log
+        for i in range(100, 140):
+            tree.add_record(Record(self.table, [i, 'x%d' % i]))
+            expected[i] = 'x%d' % i
+        for i in range(0, 100, 7):
+            self.assertTrue(tree.delete_record(i))
+            del expected[i]
+        self.assertGreater(self._log_size(), 0)
+        tree.close(checkpoint=False)
+        self.trees.remove(tree)
+
+        tree = self._open()
+        self._assert_contents(tree, expected)
+        self.assertIsNone(tree.search(7))
+
+    def test_dirty_checkpoint_after_reload(self):
+        """Test que un checkpoint tras cargar solo reescribe nodos sucios y el árbol sigue correcto."""
+        tree = self._open(load=False)
+        expected = {}
+        with tree.batched():
+            for i in range(200):
+                tree.add_record(Record(self.table, [i, 'n%d' % i]))
+                expected[i] = 'n%d' % i
+        tree.close()
+
+        tree = self._open()
+        with tree.batched():
+            for i in range(200, 260):
+                tree.add_record(Record(self.table, [i, 'm%d' % i]))
+                expected[i] = 'm%d' % i
+            for i in range(0, 200, 5):
+                tree.delete_record(i)
+                del expected[i]
+        tree.close()
+        self.assertEqual(self._log_size(), 0)
+
+        tree = self._open()
+        self._assert_contents(tree, expected)
+
+    def test_float_keys_roundtrip(self):
+        """Test que las llaves float se guardan sin perder precisión (en el .idx y en el log)."""
+        self.table = Table('tabla', [Field('id', float), Field('nombre', str, 12)], 'id')
+        keys = [1.1, 2.2, 0.1 + 0.2, -3.3]
+        tree = self._open(load=False)
+        with tree.batched():
+            for n, key in enumerate(keys[:2]):
+                tree.add_record(Record(self.table, [key, 'n%d' % n]))
+        for n, key in enumerate(keys[2:], 2):
+            tree.add_record(Record(self.table, [key, 'n%d' % n]))
+        self.assertGreater(self._log_size(), 0)
+        tree.close()
+
+        tree = self._open()
+        self.assertEqual([key for key, _ in tree.range_search(-10.0, 10.0)], sorted(keys))
+        for key in keys:
+            self.assertIsNotNone(tree.search(key), key)
+
+
+if __name__ == '__main__':
+    unittest.main()
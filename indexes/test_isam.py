@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests de persistencia del índice ISAM: formato actual (ISM2, columnas
+binarias sin pickle) y carga de los formatos anteriores (ISM1 y el estado
+completo con pickle).
+"""
+
+import os
+import sys
+import pickle
+import tempfile
+import unittest
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indexes.isam import ISAMIndex, _pack_column
+
+
+class TestISAMPersistence(unittest.TestCase):
+    """Tests de guardado/carga del ISAM."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'tabla.idx')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _build(self, keys):
+        index = ISAMIndex(None, persist_path=self.path)
+        index.bulk_insert([(key, n) for n, key in enumerate(keys)])
+        # duplicados: van al overflow en orden de llegada
+        index.insert(keys[3], 100)
+        index.insert(keys[3], 101)
+        index.insert(keys[-1], 102)
+        return index
+
+    def _load(self):
+        index = ISAMIndex(None, persist_path=self.path)
+        self.assertTrue(index.load_from_file())
+        return index
+
+    def _assert_same(self, loaded, original):
+        self.assertEqual(loaded.idx_l3, original.idx_l3)
+        self.assertEqual(loaded.idx_l2, original.idx_l2)
+        self.assertEqual(loaded.idx_l1, original.idx_l1)
+        self.assertEqual(list(zip(loaded.overflow_keys, loaded.overflow_pos)),
+                         list(zip(original.overflow_keys, original.overflow_pos)))
+        lo, hi = original.keys[0], original.keys[-1]
+        self.assertEqual(loaded.range_search(lo, hi), original.range_search(lo, hi))
+
+    def _write_v1(self, index):
+        """Escribe el índice con el formato ISM1 (overflow como dict con pickle)."""
+        overflow = {}
+        for key, pos in zip(index.overflow_keys, index.overflow_pos):
+            overflow.setdefault(key, []).append(pos)
+        key_code, key_data = _pack_column(index.keys)
+        pos_code, pos_data = _pack_column(index.positions)
+        overflow_data = pickle.dumps(overflow)
+        header = ISAMIndex.HEADER_V1.pack(ISAMIndex.MAGIC_V1, index.order, key_code + pos_code,
+                                          len(key_data), len(pos_data), len(overflow_data))
+        with open(self.path, 'wb') as f:
+            f.write(header + key_data + pos_data + overflow_data)
+
+    def test_ism2_roundtrip_int_keys(self):
+        """Test guardar y cargar con llaves enteras (columnas binarias)."""
+        original = self._build(list(range(0, 3000, 3)))
+        self.assertTrue(original.save_to_file())
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(4), ISAMIndex.MAGIC)
+        loaded = self._load()
+        self._assert_same(loaded, original)
+        self.assertEqual(loaded.get_all_positions(9), [3, 100, 101])
+
+    def test_ism2_roundtrip_str_keys(self):
+        """Test guardar y cargar con llaves str (UTF-8 con el largo delante)."""
+        original = self._build(['k%04d' % i for i in range(500)] + ['ñandú', ''])
+        self.assertTrue(original.save_to_file())
+        with open(self.path, 'rb') as f:
+            self.assertEqual(ISAMIndex.HEADER.unpack(f.read(ISAMIndex.HEADER.size))[2], b'sqsq')
+        self._assert_same(self._load(), original)
+
+    def test_unsupported_values_not_pickled(self):
+        """Test que valores que no son int/float/str no se guardan (antes iban con pickle)."""
+        index = ISAMIndex(None, persist_path=self.path)
+        index.insert(1, ['fila', 1])
+        self.assertFalse(index.save_to_file())
+
+    def test_ism2_roundtrip_empty(self):
+        """Test guardar y cargar un índice vacío."""
+        original = ISAMIndex(None, persist_path=self.path)
+        self.assertTrue(original.save_to_file())
+        loaded = self._load()
+        self.assertTrue(loaded.is_empty())
+        self.assertEqual(loaded.range_search(0, 10), [])
+
+    def test_load_ism1(self):
+        """Test cargar un archivo ISM1: el overflow en dict pasa a las listas ordenadas."""
+        original = self._build(list(range(0, 3000, 3)))
+        self._write_v1(original)
+        loaded = self._load()
+        self._assert_same(loaded, original)
+        self.assertTrue(loaded.delete(9))
+        self.assertEqual(loaded.get_all_positions(9), [100, 101])
+
+    def test_load_legacy_pickle_state(self):
+        """Test cargar el formato original: dict con las listas de tuplas de cada nivel."""
+        original = self._build(list(range(0, 3000, 3)))
+        overflow = {}
+        for key, pos in zip(original.overflow_keys, original.overflow_pos):
+            overflow.setdefault(key, []).append(pos)
+        state = {'idx_l3': original.idx_l3, 'idx_l2': [], 'idx_l1': [],
+                 'overflow': overflow, 'order': original.order}
+        with open(self.path, 'wb') as f:
+            pickle.dump(state, f)
+        self._assert_same(self._load(), original)
+
+    def test_legacy_pickle_rejects_globals(self):
+        """Test que el estado con pickle antiguo no puede instanciar clases ni llamar funciones."""
+        with open(self.path, 'wb') as f:
+            pickle.dump({'idx_l3': [(1, os.getcwd)]}, f)
+        self.assertFalse(ISAMIndex(None, persist_path=self.path).load_from_file())
+
+    def test_missing_file(self):
+        """Test que sin archivo load_from_file devuelve False."""
+        self.assertFalse(ISAMIndex(None, persist_path=self.path).load_from_file())
+
+
+if __name__ == '__main__':
+    unittest.main()
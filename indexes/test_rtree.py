@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Tests del snapshot binario del índice R-tree (RTI2 + árbol empaquetado RTP2):
+guardar y cargar debe dar las mismas respuestas que el árbol original, y un
+snapshot que no corresponde al archivo de datos se descarta.
+"""
+
+import os
+import sys
+import random
+import tempfile
+import unittest
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.models import Table, Field, Record
+from core.file_manager import FileManager
+from indexes.rtree import RTreeIndex
+
+
+class TestRTreeSnapshot(unittest.TestCase):
+    """Tests de save_to_file/load_from_file del RTreeIndex."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'lugares.rtree')
+        self.fields = [Field('x', float), Field('y', float)]
+        self.rng = random.Random(7)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _build(self, ids):
+        index = RTreeIndex(self.path, self.fields, max_children=4)
+        for n, rec_id in enumerate(ids):
+            point = {'id': rec_id, 'x': self.rng.uniform(0, 100), 'y': self.rng.uniform(0, 100)}
+            index.insert(point, pos=n * 10)
+        return index
+
+    def _load(self):
+        index = RTreeIndex(self.path, self.fields, max_children=4)
+        self.assertTrue(index.load_from_file())
+        return index
+
+    def _assert_same_answers(self, loaded, original, ids):
+        for rec_id in ids:
+            self.assertEqual(loaded.search(rec_id), original.search(rec_id))
+        for _ in range(30):
+            x, y = self.rng.uniform(0, 100), self.rng.uniform(0, 100)
+            bbox = (x, y, x + 20, y + 20)
+            self.assertEqual(sorted(loaded.bbox_search(bbox), key=str),
+                             sorted(original.bbox_search(bbox), key=str))
+            radius = self.rng.uniform(0, 15)
+            self.assertEqual(sorted(loaded.spatial_search((x, y), radius), key=str),
+                             sorted(original.spatial_search((x, y), radius), key=str))
+            k = self.rng.randint(1, 8)
+            self.assertEqual(loaded.spatial_search((x, y), k), original.spatial_search((x, y), k))
+
+    def test_roundtrip_int_ids(self):
+        """Test snapshot con ids enteros densos (payloads int64 y mapa en array)."""
+        ids = list(range(500))
+        original = self._build(ids)
+        self.assertTrue(original.save_to_file())
+        self._assert_same_answers(self._load(), original, ids)
+
+    def test_roundtrip_str_ids(self):
+        """Test snapshot con ids str (payloads y mapa id -> posición en UTF-8, sin pickle)."""
+        ids = ['p%d' % i for i in range(300)] + ['ñandú']
+        original = self._build(ids)
+        self.assertTrue(original.save_to_file())
+        with open(self.path, 'rb') as f:
+            self.assertEqual(RTreeIndex.HEADER.unpack(f.read(RTreeIndex.HEADER.size))[-1], b's')
+        self._assert_same_answers(self._load(), original, ids)
+
+    def test_insert_and_delete_after_load(self):
+        """Test que el árbol cargado (empaquetado) admite inserciones y borrados."""
+        original = self._build(list(range(200)))
+        self.assertTrue(original.save_to_file())
+        loaded = self._load()
+        loaded.insert({'id': 999, 'x': 50.0, 'y': 50.0}, pos=9990)
+        self.assertIn(999, loaded.bbox_search((49.9, 49.9, 50.1, 50.1)))
+        self.assertEqual(loaded.search(999), 9990)
+        loaded.rtree.delete(999)
+        self.assertNotIn(999, loaded.bbox_search((49.9, 49.9, 50.1, 50.1)))
+
+    def test_stale_snapshot_rebuilds_from_data(self):
+        """Test que un snapshot guardado con otro estado del archivo de datos se descarta."""
+        table = Table('lugares', [Field('id', int), Field('x', float), Field('y', float)], 'id')
+        fm = FileManager(os.path.join(self.tmp.name, 'lugares.dat'), table)
+        self.addCleanup(fm.close)
+        index = RTreeIndex(self.path, self.fields, max_children=4, file_manager=fm)
+        for rec_id in range(20):
+            record = Record(table, [rec_id, float(rec_id), float(rec_id)])
+            index.insert({'id': rec_id, 'x': float(rec_id), 'y': float(rec_id)}, fm.add_record(record))
+        self.assertTrue(index.save_to_file())
+
+        # El .dat cambia después del snapshot: un registro nuevo y uno borrado
+        fm.add_record(Record(table, [20, 50.0, 50.0]))
+        fm.remove_record(index.search(3))
+        loaded = RTreeIndex(self.path, self.fields, max_children=4, file_manager=fm)
+        self.assertTrue(loaded.load_from_file())
+        self.assertEqual(loaded.bbox_search((49.0, 49.0, 51.0, 51.0)), [20])
+        self.assertEqual(loaded.bbox_search((2.5, 2.5, 3.5, 3.5)), [])
+        self.assertEqual(loaded.search(20), 20)
+
+        # Sin cambios en el .dat el snapshot sí se usa: trae un punto que
+        # solo estaba en el índice
+        loaded.insert({'id': 99, 'x': 80.0, 'y': 80.0})
+        self.assertTrue(loaded.save_to_file())
+        loaded = RTreeIndex(self.path, self.fields, max_children=4, file_manager=fm)
+        self.assertTrue(loaded.load_from_file())
+        self.assertEqual(loaded.bbox_search((79.0, 79.0, 81.0, 81.0)), [99])
+
+    def test_missing_file_without_data(self):
+        """Test que sin snapshot ni archivo de datos load_from_file devuelve False."""
+        self.assertFalse(RTreeIndex(self.path, self.fields).load_from_file())
+
+
+if __name__ == '__main__':
+    unittest.main()
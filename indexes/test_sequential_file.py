@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests de la reconstrucción del Sequential File: merge del .dat con el .aux
+saltando tramos de borrados, con llaves repetidas entre ambos archivos.
+"""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+# Agregar el directorio padre al path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.models import Table, Field, Record
+from core.file_manager import iter_packed_rows
+from indexes.sequential_file import SequentialIndex
+from core.databasemanager import DatabaseManager
+
+
+class TestSequentialRebuild(unittest.TestCase):
+    """Tests del _rebuild con llaves enteras (llaves del .dat cacheadas en un array)."""
+
+    key_type = int
+
+    def key(self, n):
+        return n
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmp.name, 'tabla.dat')
+        key_field = Field('id', int) if self.key_type is int else Field('id', str, 8)
+        self.table = Table('tabla', [key_field, Field('nombre', str, 8)], 'id')
+        self.indexes = []
+        # Los mensajes de reconstrucción no interesan en los tests
+        self._quiet = redirect_stdout(io.StringIO())
+        self._quiet.__enter__()
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.close()
+        self._quiet.__exit__(None, None, None)
+        self.tmp.cleanup()
+
+    def _open(self) -> SequentialIndex:
+        index = SequentialIndex(self.filename, self.table)
+        # Sin reconstrucciones automáticas: cada test decide cuándo
+        index.K_threshold = 10 ** 6
+        self.indexes.append(index)
+        return index
+
+    def _record(self, n, name):
+        return Record(self.table, [self.key(n), name])
+
+    def _dat_contents(self):
+        """(llave, nombre, next) de cada registro físico del .dat, en orden."""
+        records = [Record.unpack_from_row(self.table, row) for row in iter_packed_rows(self.filename, self.table)]
+        return [(r.key, r.values[1], r.next) for r in records]
+
+    def test_rebuild_skips_dead_runs_and_keeps_duplicates(self):
+        """Test que el .dat reconstruido no tiene borrados, va ordenado y con empates el .dat va primero."""
+        index = self._open()
+        index.add_many([self._record(n, 'n%d' % n) for n in range(0, 80, 2)])
+        index._rebuild()
+
+        # Tramos de borrados: al inicio, uno largo en medio y al final
+        for n in [0] + list(range(20, 32, 2)) + [78]:
+            self.assertTrue(index.delete(self.key(n)))
+        # .aux: un registro cae dentro del tramo borrado, otros antes y después
+        # de todo, uno repite una llave viva y otro una llave borrada
+        index.add_many([self._record(25, 'medio'), self._record(-1, 'antes'),
+                        self._record(99, 'despues'), self._record(40, 'aux40'),
+                        self._record(22, 'nuevo22'), self._record(51, 'borrado')])
+        self.assertTrue(index.delete(self.key(51)))
+        index.save_to_file()
+
+        expected = {n: 'n%d' % n for n in range(0, 80, 2) if n not in [0, 78] + list(range(20, 32, 2))}
+        expected.update({25: 'medio', -1: 'antes', 99: 'despues', 22: 'nuevo22'})
+        rows = sorted((self.key(n), name) for n, name in expected.items())
+        # el 40 del .dat antes que el del .aux
+        at = rows.index((self.key(40), 'n40'))
+        rows.insert(at + 1, (self.key(40), 'aux40'))
+        self.assertEqual(self._dat_contents(), [(key, name, 0) for key, name in rows])
+        self.assertEqual(index.aux_records_count, 0)
+        self.assertEqual(os.path.getsize(index.aux_filename), 0)
+
+        # Reabrir: el .dat reconstruido se busca sin volver a reconstruir
+        index.close()
+        self.indexes.remove(index)
+        index = self._open()
+        self.assertEqual([(r.key, r.values[1]) for r in index.get_all()], rows)
+        self.assertEqual(index.search(self.key(25))[1], 'medio')
+        self.assertIsNone(index.search(self.key(20)))
+        self.assertIsNone(index.search(self.key(51)))
+
+    def test_rebuild_everything_deleted(self):
+        """Test que si todo el .dat está borrado solo quedan los registros del .aux."""
+        index = self._open()
+        index.add_many([self._record(n, 'n%d' % n) for n in range(10)])
+        index._rebuild()
+        for n in range(10):
+            self.assertTrue(index.delete(self.key(n)))
+        index.add_many([self._record(5, 'cinco')])
+        index.save_to_file()
+        self.assertEqual(self._dat_contents(), [(self.key(5), 'cinco', 0)])
+
+    def test_database_manager_get_all_in_key_order(self):
+        """Test que DatabaseManager.get_all devuelve el mismo orden que SequentialIndex.get_all."""
+        manager = DatabaseManager(self.table, self.filename, index_type='sequential')
+        self.addCleanup(manager.close)
+        manager.index.K_threshold = 10 ** 6
+        manager.add_records([self._record(n, 'n%d' % n) for n in range(0, 20, 2)])
+        manager.index._rebuild()
+        # sin reconstruir: quedan en el .aux, desordenados y uno con llave repetida
+        manager.add_records([self._record(n, 'aux%d' % n) for n in (15, -3, 4, 7)])
+        rows = [(r.key, r.values[1]) for r in manager.get_all()]
+        self.assertEqual(rows, [(r.key, r.values[1]) for r in manager.index.get_all()])
+        self.assertEqual([key for key, _ in rows], sorted(key for key, _ in rows))
+        at = rows.index((self.key(4), 'n4'))
+        self.assertEqual(rows[at + 1], (self.key(4), 'aux4'))
+
+
+class TestSequentialRebuildStrKeys(TestSequentialRebuild):
+    """Los mismos tests con llaves str (búsqueda por bloques en el mmap)."""
+
+    key_type = str
+
+    def key(self, n):
+        return 'k%+04d' % n
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,21 +10,49 @@ statement_list: statement (";" statement)* ";"?    // permite múltiples stateme
           | update_statement
           | delete_statement
 
+// Palabras clave como terminales con nombre (se filtran del árbol por el
+// prefijo _); el lexer contextual las compila una sola vez junto a CNAME
+_CREATE: "CREATE"i
+_TABLE: "TABLE"i
+_FROM: "FROM"i
+_FILE: "FILE"i
+_USING: "USING"i
+_INDEX: "INDEX"i
+_KEY: "KEY"i
+_SELECT: "SELECT"i
+_WHERE: "WHERE"i
+_BETWEEN: "BETWEEN"i
+_IN: "IN"i
+_ORDER: "ORDER"i
+_BY: "BY"i
+_ASC: "ASC"i
+_DESC: "DESC"i
+_LIMIT: "LIMIT"i
+_INSERT: "INSERT"i
+_INTO: "INTO"i
+_VALUES: "VALUES"i
+_UPDATE: "UPDATE"i
+_SET: "SET"i
+_DELETE: "DELETE"i
+_NULL: "NULL"i
+_AND: "AND"i
+_OR: "OR"i
+
 // CREATE TABLE (schema)
-create_table_statement: "CREATE"i "TABLE"i CNAME "(" field_definitions ")"
+create_table_statement: _CREATE _TABLE CNAME "(" field_definitions ")"
 
 // CREATE TABLE ... FROM FILE ... USING INDEX ...
 //create_from_file_statement: "CREATE"i "TABLE"i CNAME "FROM"i "FILE"i string_literal "USING"i "INDEX"i "(" CNAME ")"
 
-create_table_from_file: "CREATE"i "TABLE"i CNAME "FROM"i "FILE"i string_literal "USING"i "INDEX"i index_type "(" key_field ")"
+create_table_from_file: _CREATE _TABLE CNAME _FROM _FILE string_literal _USING _INDEX index_type "(" key_field ")"
 index_type: CNAME
 key_field: CNAME | string_literal
 
 field_definitions: field_definition ("," field_definition)*
 field_definition: CNAME data_type index_options?
 
-index_options: "KEY"i "INDEX"i index_type
-             | "INDEX"i index_type
+index_options: _KEY _INDEX index_type
+             | _INDEX index_type
 
 // DATA TYPES
 data_type: "INT"i
@@ -42,46 +70,48 @@ data_type: "INT"i
 //key_field: CNAME | string_literal
 
 // SELECT
-select_statement: "SELECT"i select_list "FROM"i CNAME where_clause? order_clause? limit_clause?
+select_statement: _SELECT select_list _FROM CNAME where_clause? order_clause? limit_clause?
 select_list: "*" -> select_all
            | field_name ("," field_name)*
 
 // WHERE clause mejorado
-where_clause: "WHERE"i condition
+where_clause: _WHERE or_condition
 
-?condition: comparison 
-          | between_condition
-          | spatial_condition
-          | condition ("AND"i | "OR"i) condition
+// listas planas por nivel: AND liga más fuerte que OR, como en SQL
+?or_condition: and_condition (_OR and_condition)*
+?and_condition: condition_term (_AND condition_term)*
+?condition_term: comparison
+               | between_condition
+               | spatial_condition
 
 // Usar patrones más simples
-between_condition: field_name "BETWEEN"i value "AND"i value
-spatial_condition: field_name "IN"i "(" value "," value ")"  // point y radius como values genéricos
+between_condition: field_name _BETWEEN value _AND value
+spatial_condition: field_name _IN "(" value "," value ")"  // point y radius como values genéricos
 
 comparison: field_name comparison_operator value
 comparison_operator: "=" | "!=" | "<>" | "<" | ">" | "<=" | ">="
 
 // Optional ORDER BY / LIMIT
-order_clause: "ORDER"i "BY"i field_name ("ASC"i | "DESC"i)?
-limit_clause: "LIMIT"i INT
+order_clause: _ORDER _BY field_name (_ASC | _DESC)?
+limit_clause: _LIMIT INT
 
 // INSERT
-insert_statement: "INSERT"i "INTO"i CNAME "VALUES"i "(" value_list ")"
+insert_statement: _INSERT _INTO CNAME _VALUES "(" value_list ")"
 value_list: value ("," value)*
 
 // UPDATE
-update_statement: "UPDATE"i CNAME "SET"i assignment_list where_clause?
+update_statement: _UPDATE CNAME _SET assignment_list where_clause?
 assignment_list: assignment ("," assignment)*
 assignment: field_name "=" value
 
 // DELETE
-delete_statement: "DELETE"i "FROM"i CNAME where_clause?
+delete_statement: _DELETE _FROM CNAME where_clause?
 
 // VALUES and point/radius
 ?value: SIGNED_NUMBER     -> number
       | string_literal    -> string
       | point
-      | "NULL"i           -> null
+      | _NULL             -> null
 
 point: "(" SIGNED_NUMBER "," SIGNED_NUMBER ")"
 radius: SIGNED_NUMBER
@@ -22,6 +22,17 @@ from indexes.isam import ISAMIndex
 from indexes.sequential_file import SequentialIndex
 
 
+# Conversión de los valores leídos del CSV según el tipo SQL del campo
+# (los tipos no listados se guardan como texto)
+_CSV_CONVERTERS = {
+    'INT': lambda value: int(value) if value.strip() else 0,
+    'FLOAT': lambda value: float(value) if value.strip() else 0.0,
+}
+
+# Filas del CSV que se acumulan antes de un add_many en las estructuras que
+# lo soportan (Sequential File): una escritura y a lo más un rebuild por lote
+_CSV_BATCH = 4096
+
 
 class SQLExecutor:
     """Executor que ejecuta ExecutionPlan sobre las estructuras de datos."""
@@ -312,7 +323,6 @@ class SQLExecutor:
                         raise ValueError("R-tree requiere al menos 2 campos numéricos para coordenadas")
                 
                 # CREAR OBJETOS Field a partir de los diccionarios
-                from core.models import Field
                 spatial_field_objects = []
                 for field_info in spatial_fields[:2]:  # Solo necesitamos 2 campos para coordenadas
                     # Convertir tipo string a clase Python
@@ -332,8 +342,7 @@ class SQLExecutor:
                 
                 structure = RTreeIndex(
                     index_filename=f"data/{table_name}_rtree.idx",
-                    fields=spatial_field_objects,
-                    max_children=4
+                    fields=spatial_field_objects
                 )
                 print(f"DEBUG R-tree creado exitosamente: {type(structure)}")
                 
@@ -355,20 +364,16 @@ class SQLExecutor:
                 reader = csv.DictReader(f)
                 record_count = 0
                 
+                # El conversor de cada campo y la posición de la clave se
+                # resuelven una sola vez, no por cada fila del CSV
+                converters = [(field['name'], _CSV_CONVERTERS.get(field['type'], str)) for field in fields]
+                key_index = next((i for i, f in enumerate(fields) if f['name'] == key_field), 0)
+                batch = [] if hasattr(structure, 'add_many') else None
+                
                 for row in reader:
-                    values = []
-                    for field in fields:
-                        value = row.get(field['name'], '')
-                        
-                        if field['type'] == 'INT':
-                            values.append(int(value) if value.strip() else 0)
-                        elif field['type'] == 'FLOAT':
-                            values.append(float(value) if value.strip() else 0.0)
-                        else:  # VARCHAR
-                            values.append(str(value))
+                    values = [convert(row.get(name, '')) for name, convert in converters]
                     
                     # Encontrar valor de la clave
-                    key_index = next((i for i, f in enumerate(fields) if f['name'] == key_field), 0)
                     key_value = values[key_index] if key_index < len(values) else record_count
                     
                     # Insertar en estructura REAL (manejo especial para R-tree)
@@ -384,11 +389,18 @@ class SQLExecutor:
                         
                         structure.insert(record_dict, record_count)
                         print(f"DEBUG Insertado en R-tree: {key_value} -> {record_dict}")
+                    elif batch is not None:
+                        batch.append(Record(structure.table, values))
+                        if len(batch) >= _CSV_BATCH:
+                            structure.add_many(batch)
+                            batch = []
                     else:
                         structure.insert(key_value, values)
                     
                     record_count += 1
                 
+                if batch:
+                    structure.add_many(batch)
                 return record_count
                 
         except Exception as e:
@@ -541,26 +541,25 @@ class SQLTransformer(Transformer):
         
         return None
 
-    def condition(self, items):
-        """Procesa condiciones (puede ser simple o compuesta)."""
-        print(f"DEBUG condition items: {items}")
-        
-        if len(items) == 1:
-            # Condición simple
-            return self._unwrap_tree_token(items[0])
-        elif len(items) >= 3:
-            # Condición compuesta (AND/OR)
-            left = self._unwrap_tree_token(items[0])
-            operator = self._unwrap_tree_token(items[1]).lower()
-            right = self._unwrap_tree_token(items[2])
-            
-            return {
+    def or_condition(self, items):
+        """Procesa cond OR cond OR ... (cada cond puede ser un AND)."""
+        return self._fold_conditions("or", items)
+
+    def and_condition(self, items):
+        """Procesa cond AND cond AND ..."""
+        return self._fold_conditions("and", items)
+
+    def _fold_conditions(self, operator, items):
+        """Agrupa por la izquierda una lista plana de condiciones del mismo operador."""
+        print(f"DEBUG {operator}_condition items: {items}")
+        left = self._unwrap_tree_token(items[0])
+        for item in items[1:]:
+            left = {
                 "type": operator,
                 "left": left,
-                "right": right
+                "right": self._unwrap_tree_token(item)
             }
-        
-        return None
+        return left
 
     def between(self, *items):
         # field, a, AND, b
@@ -843,12 +842,27 @@ class SQLTransformer(Transformer):
         """Procesa cierre de corchete ] para tamaño."""
         return "]"
 
+# Parsers Lark ya construidos, por gramática: las tablas LALR se calculan una
+# sola vez por proceso y todas las instancias de SQLParser las comparten.
+# cache=True además guarda el autómata en el directorio temporal, así que un
+# proceso nuevo lo carga en vez de recalcularlo
+_LARK_PARSERS: Dict[str, Lark] = {}
+
+
+def _get_lark(grammar: str) -> Lark:
+    parser = _LARK_PARSERS.get(grammar)
+    if parser is None:
+        parser = _LARK_PARSERS[grammar] = Lark(grammar, parser='lalr', lexer='contextual',
+                                               transformer=SQLTransformer(), cache=True)
+    return parser
+
+
 class SQLParser:
     """Parser SQL principal que devuelve ExecutionPlan."""
     
     def __init__(self, grammar: str = GRAMMAR):
-        """Inicializa el parser con la gramática."""
-        self.parser = Lark(grammar, parser='lalr', transformer=SQLTransformer())
+        """Inicializa el parser con la gramática (compilada una vez por proceso)."""
+        self.parser = _get_lark(grammar)
     
     def parse(self, sql_command: str) -> Union[ExecutionPlan, Dict, None]:
         """
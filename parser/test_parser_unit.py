@@ -140,6 +140,55 @@ class TestSQLParser(unittest.TestCase):
         self.assertEqual(where_clause['start'], 10.5)
         self.assertEqual(where_clause['end'], 50.0)
     
+    def _where(self, condition):
+        """Parsea SELECT * FROM t WHERE <condition> y devuelve el where_clause."""
+        plan = self.parser.parse(f"SELECT * FROM t WHERE {condition}")
+        self.assertIsInstance(plan, ExecutionPlan)
+        return plan.data['where_clause']
+
+    @staticmethod
+    def _eq(field, value):
+        return {'type': 'comparison', 'field': field, 'operator': '=', 'value': value}
+
+    def test_where_single_condition(self):
+        """Test WHERE con una sola condición (sin AND/OR)."""
+        self.assertEqual(self._where("a = 1"), self._eq('a', 1))
+
+    def test_where_and(self):
+        """Test WHERE con AND: se agrupa por la izquierda."""
+        self.assertEqual(self._where("a = 1 AND b = 2 and c = 3"), {
+            'type': 'and',
+            'left': {'type': 'and', 'left': self._eq('a', 1), 'right': self._eq('b', 2)},
+            'right': self._eq('c', 3),
+        })
+
+    def test_where_or(self):
+        """Test WHERE con OR."""
+        self.assertEqual(self._where("a = 1 OR b = 2"),
+                         {'type': 'or', 'left': self._eq('a', 1), 'right': self._eq('b', 2)})
+
+    def test_where_and_binds_tighter_than_or(self):
+        """Test precedencia: a OR b AND c es a OR (b AND c); a AND b OR c es (a AND b) OR c."""
+        b_and_c = {'type': 'and', 'left': self._eq('b', 2), 'right': self._eq('c', 3)}
+        self.assertEqual(self._where("a = 1 OR b = 2 AND c = 3"),
+                         {'type': 'or', 'left': self._eq('a', 1), 'right': b_and_c})
+        a_and_b = {'type': 'and', 'left': self._eq('a', 1), 'right': self._eq('b', 2)}
+        self.assertEqual(self._where("a = 1 AND b = 2 OR c = 3"),
+                         {'type': 'or', 'left': a_and_b, 'right': self._eq('c', 3)})
+
+    def test_where_between_inside_and(self):
+        """Test que el AND de BETWEEN no se confunda con el AND lógico."""
+        self.assertEqual(self._where("id BETWEEN 2 AND 4 AND a = 1"), {
+            'type': 'and',
+            'left': {'type': 'between', 'field': 'id', 'start': 2, 'end': 4},
+            'right': self._eq('a', 1),
+        })
+        self.assertEqual(self._where("a = 1 AND id BETWEEN 2 AND 4"), {
+            'type': 'and',
+            'left': self._eq('a', 1),
+            'right': {'type': 'between', 'field': 'id', 'start': 2, 'end': 4},
+        })
+    
     def test_select_with_spatial_condition(self):
         """Test SELECT con condición espacial."""
         sql = "SELECT * FROM Restaurantes WHERE ubicacion IN ((40.4168, -3.7038), 0.1)"